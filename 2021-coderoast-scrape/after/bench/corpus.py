@@ -0,0 +1,100 @@
+import json
+import os
+import random
+from dataclasses import asdict, dataclass
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pra", "stel", "quon"]
+LINE_WIDTH = 12
+LINES_PER_PAGE = 60
+
+
+@dataclass
+class CorpusSpec:
+    """Describes a synthetic corpus. The same spec and seed always produce the same files."""
+
+    documents: int = 40
+    min_pages: int = 1
+    max_pages: int = 30
+    min_words_per_page: int = 100
+    max_words_per_page: int = 600
+    lexicon_hit_rate: float = 0.02
+    seed: int = 2021
+
+
+def filler_words(rng: random.Random, n: int) -> list[str]:
+    return [
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        for _ in range(n)
+    ]
+
+
+def escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(file_name: str, pages: list[list[str]], title: str = "") -> None:
+    """Writes a minimal PDF with one Helvetica text stream per page, each page given as its lines."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # The page tree is filled in once the page object numbers are known.
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        f"<< /Title ({escape(title)}) >>".encode(),
+    ]
+    page_ids = []
+    for lines in pages:
+        text = "".join(f"({escape(line)}) '\n" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 760 Td\n{text}ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]"
+            b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += (
+        b"trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+    with open(file_name, "wb") as f:
+        f.write(output)
+
+
+def generate_corpus(folder: str, spec: CorpusSpec, lexicon: list[str]) -> list[str]:
+    """Writes spec.documents PDFs into folder, named in the YYMMDD_DOI.pdf format guess_doi expects.
+    Each word is drawn from the lexicon with probability spec.lexicon_hit_rate, and from made-up filler otherwise.
+    """
+    rng = random.Random(spec.seed)
+    vocabulary = filler_words(rng, 5000)
+    os.makedirs(folder, exist_ok=True)
+    files = []
+    for number in range(spec.documents):
+        pages = []
+        for _ in range(rng.randint(spec.min_pages, spec.max_pages)):
+            words = [
+                rng.choice(lexicon)
+                if lexicon and rng.random() < spec.lexicon_hit_rate
+                else rng.choice(vocabulary)
+                for _ in range(rng.randint(spec.min_words_per_page, spec.max_words_per_page))
+            ]
+            lines = [
+                " ".join(words[start : start + LINE_WIDTH])
+                for start in range(0, len(words), LINE_WIDTH)
+            ]
+            pages.append(lines[:LINES_PER_PAGE])
+        file_name = os.path.join(folder, f"210101_10.9999synthetic{number:05d}.pdf")
+        write_pdf(file_name, pages, title=" ".join(rng.sample(vocabulary, 8)))
+        files.append(file_name)
+    with open(os.path.join(folder, "corpus.json"), "w") as f:
+        json.dump(asdict(spec), f)
+    return files
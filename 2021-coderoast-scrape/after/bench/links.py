@@ -0,0 +1,83 @@
+"""Benchmarks the Sci-Hub result page link extractors on the saved pages in bench/pages.
+
+Run it from the after/ directory:
+
+    python -m bench.links --repeat 200
+
+Each run appends one JSON record to the output file, tagged with the current commit,
+which goes under bench/output unless told otherwise.
+It fails if the two extractors disagree on any page.
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import time
+from datetime import datetime
+
+from bench.run import OUTPUT_DIR, append_record, current_commit
+from scrape.links import CHUNK_SIZE, extract_links, extract_links_with_soup
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+
+
+def chunks_of(html: str, chunk_size: int) -> list[str]:
+    """Splits a page the way it would arrive from a streamed response."""
+    return [html[start : start + chunk_size] for start in range(0, len(html), chunk_size)]
+
+
+def best_time(extract, page, repeat: int) -> float:
+    """Returns the fastest of repeat runs, in seconds, which is the least disturbed by the rest of the machine."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract(page)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages-dir", default=PAGES_DIR)
+    parser.add_argument("--output", default=os.path.join(OUTPUT_DIR, "links.jsonl"))
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    pages = {}
+    for path_name in sorted(glob.glob(os.path.join(args.pages_dir, "*.html"))):
+        with open(path_name, encoding="utf-8") as f:
+            html = f.read()
+        chunks = chunks_of(html, args.chunk_size)
+        streamed, souped = extract_links(chunks), extract_links_with_soup(html)
+        stream_seconds = best_time(extract_links, chunks, args.repeat)
+        soup_seconds = best_time(extract_links_with_soup, html, args.repeat)
+        pages[os.path.basename(path_name)] = {
+            "bytes": len(html.encode()),
+            "links": len(streamed),
+            "identical": streamed == souped,
+            "stream_seconds": stream_seconds,
+            "soup_seconds": soup_seconds,
+            "speedup": soup_seconds / stream_seconds,
+        }
+
+    record = {
+        "commit": current_commit(),
+        "time": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "chunk_size": args.chunk_size,
+        "pages": pages,
+        "speedup": sum(page["soup_seconds"] for page in pages.values())
+        / sum(page["stream_seconds"] for page in pages.values()),
+    }
+    append_record(args.output, record)
+    print(json.dumps(record, indent=4))
+    if not all(page["identical"] for page in pages.values()):
+        raise SystemExit("[sciscraper]: The link extractors found different links.")
+
+
+if __name__ == "__main__":
+    main()
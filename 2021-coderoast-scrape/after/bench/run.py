@@ -0,0 +1,159 @@
+"""Benchmarks the PDF scrape pipeline on a reproducible synthetic corpus.
+
+Run it from the after/ directory:
+
+    python -m bench.run --documents 40 --workers 4
+
+Each run appends one JSON record to the output file, tagged with the current commit,
+so that runs on different commits can be compared. The corpus and the results go under
+bench/output, which git ignores, unless told otherwise.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from collections import Counter
+from dataclasses import asdict, replace
+from datetime import datetime
+
+from bench.corpus import CorpusSpec, generate_corpus
+from scrape.config import read_config
+from scrape.fetch import fetch_terms_from_pdf_files
+from scrape.lexicon import read_terms
+from scrape.matrix import DocumentTermMatrixBuilder
+from scrape.pdf import (
+    DocumentCounts,
+    PDFScrape,
+    build_pdf_scraper,
+    count_filtered_tokens,
+    guess_doi,
+    normalize_page,
+)
+
+STAGES = ["extract", "normalize", "tokenize", "lexicon", "frequency"]
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "output")
+
+
+def append_record(output: str, record: dict) -> None:
+    """Appends the record to the output file as one JSON line, creating its folder if need be."""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Stopwatch:
+    """Adds the time since the previous lap to the named stage."""
+
+    def __init__(self) -> None:
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.last = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.totals[stage] += now - self.last
+        self.last = now
+
+
+def time_stages(scraper: PDFScrape, files: list[str]) -> tuple[dict[str, float], int]:
+    """Runs each stage of PDFScrape.scrape over the whole corpus, one stage after another per document.
+    Returns the seconds spent in every stage and the number of pages read.
+    """
+    stopwatch = Stopwatch()
+    words, terms = DocumentTermMatrixBuilder(), DocumentTermMatrixBuilder()
+    documents = []
+    pages = 0
+    for file in files:
+        preprints = list(scraper.extract_pages_from_pdf(file))
+        stopwatch.lap("extract")
+        postprints = [normalize_page(preprint) for preprint in preprints]
+        stopwatch.lap("normalize")
+        word_counts = count_filtered_tokens(postprints, scraper.tokenizer)
+        stopwatch.lap("tokenize")
+        term_counts: Counter[str] = Counter()
+        for postprint in postprints:
+            term_counts.update(scraper.lexicon.count(postprint))
+        stopwatch.lap("lexicon")
+        words.add(word_counts)
+        terms.add(term_counts)
+        documents.append(DocumentCounts(guess_doi(file), Counter(), Counter()))
+        pages += len(preprints)
+        stopwatch.lap("frequency")
+    scraper.score(documents, words.build(), terms.build())
+    stopwatch.lap("frequency")
+    return stopwatch.totals, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default="./config.json")
+    parser.add_argument("--corpus-dir", default=os.path.join(OUTPUT_DIR, "corpus"))
+    parser.add_argument("--output", default=os.path.join(OUTPUT_DIR, "results.jsonl"))
+    parser.add_argument("--documents", type=int, default=CorpusSpec.documents)
+    parser.add_argument("--max-pages", type=int, default=CorpusSpec.max_pages)
+    parser.add_argument("--hit-rate", type=float, default=CorpusSpec.lexicon_hit_rate)
+    parser.add_argument("--seed", type=int, default=CorpusSpec.seed)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    config = read_config(args.config)
+    spec = CorpusSpec(
+        documents=args.documents,
+        max_pages=args.max_pages,
+        lexicon_hit_rate=args.hit_rate,
+        seed=args.seed,
+    )
+    lexicon = sorted(
+        read_terms(config.target_words)
+        | read_terms(config.bycatch_words)
+        | read_terms(config.research_words)
+    )
+    files = generate_corpus(args.corpus_dir, spec, lexicon)
+    config = replace(
+        config,
+        paper_folder=args.corpus_dir,
+        workers=args.workers,
+        cache_dir=None,
+        manifest_file=None,
+    )
+
+    stages, pages = time_stages(build_pdf_scraper(config), files)
+    start = time.perf_counter()
+    fetch_terms_from_pdf_files(config)
+    elapsed = time.perf_counter() - start
+
+    record = {
+        "commit": current_commit(),
+        "time": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "corpus": asdict(spec),
+        "workers": args.workers,
+        "documents": len(files),
+        "pages": pages,
+        "stages": stages,
+        "pipeline": {
+            "seconds": elapsed,
+            "documents_per_second": len(files) / elapsed,
+            "pages_per_second": pages / elapsed,
+        },
+    }
+    append_record(args.output, record)
+    print(json.dumps(record, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,57 @@
+import argparse
 import time
+from contextlib import nullcontext
 
-from scrape.fetch import fetch_terms_from_pdf_files
-from scrape.export import export
+from scrape.fetch import stream_terms_from_pdf_files
+from scrape.export import export_stream
 from scrape.config import read_config
+from scrape.journal import build_journal
 from scrape.log import log_msg
+from scrape.metrics import METRICS
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrapes and scores the PDFs in the paper folder.")
+    parser.add_argument("--config", default="./config.json")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip the files journaled by an earlier run that was interrupted",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="discard the journal of an earlier run and scrape every file again",
+    )
+    args = parser.parse_args()
 
     # read the configuration settings from a JSON file
-    config = read_config("./config.json")
+    config = read_config(args.config)
 
-    # fetch data from the PDF files and export it
+    # fetch data from the PDF files, journaling and exporting it as it comes in
     start = time.perf_counter()
-    results = fetch_terms_from_pdf_files(config)
-    export(results, config.export_dir)
+    # A manifest run keeps its progress in the manifest, so it is not journaled.
+    journaled = not config.manifest_file
+    try:
+        journal_context = (
+            build_journal(config, resume=args.resume, overwrite=args.restart) if journaled else nullcontext()
+        )
+    except FileExistsError as e:
+        raise SystemExit(f"[sciscraper]: {e}. Pass --resume or --restart.")
+    with journal_context as journal:
+        results = stream_terms_from_pdf_files(config, journal)
+        export_stream(results, config.export_dir, config.export_batch_size)
+        if journal is not None:
+            journal.finish()
     elapsed = time.perf_counter() - start
     log_msg(f"\n[sciscraper]: Extraction finished in {elapsed} seconds.\n")
 
+    # write the per-stage timings and counters of the run
+    METRICS.write_report(config.run_report)
+    if config.prometheus_textfile:
+        METRICS.write_prometheus(config.prometheus_textfile)
+    log_msg(f"\n[sciscraper]: A run report was written to {config.run_report}.\n")
+
 
 if __name__ == "__main__":
     main()
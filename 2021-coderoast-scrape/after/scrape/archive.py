@@ -0,0 +1,157 @@
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from os import listdir, path, stat
+from typing import BinaryIO, Iterator, Optional
+
+from scrape.cache import CHUNK_SIZE, file_digest
+
+ZIP_PATTERNS = ("*.zip",)
+TAR_PATTERNS = ("*.tar", "*.tar.gz", "*.tgz", "*.tar.bz2", "*.tar.xz")
+# Archive members up to this size are spooled in memory, and larger ones to a temporary file.
+SPOOL_BYTES = 8 << 20
+
+
+@dataclass
+class PdfSource:
+    """A PDF to scrape: either a loose file, or a member of an archive.
+    An archive member is named as a path inside its archive, and only carries what it takes to find it again:
+    the archive, the member's name, and for a tar archive the offset of its content.
+    Its content is read when it is scraped or hashed, so a list of sources costs next to no memory.
+    """
+
+    name: str
+    size: int
+    mtime: float
+    archive: Optional[str] = None
+    member: Optional[str] = None
+    offset: int = 0
+
+    @contextmanager
+    def _member_stream(self) -> Iterator[BinaryIO]:
+        if is_zip(self.archive):
+            with zipfile.ZipFile(self.archive) as archive, archive.open(self.member) as stream:
+                yield stream
+            return
+        with _tar_content(self.archive) as content:
+            content.seek(self.offset)
+            yield _Limited(content, self.size)
+
+    @contextmanager
+    def content(self) -> Iterator[Optional[BinaryIO]]:
+        """Yields a seekable file holding an archive member's content, or None for a loose file,
+        which is read from its path."""
+        if self.archive is None:
+            yield None
+            return
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+            with self._member_stream() as stream:
+                shutil.copyfileobj(stream, spool, CHUNK_SIZE)
+            spool.seek(0)
+            yield spool
+
+    def digest(self) -> str:
+        if self.archive is None:
+            return file_digest(self.name)
+        digest = hashlib.sha256()
+        with self._member_stream() as stream:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+class _Limited:
+    """Reads at most size bytes from a stream."""
+
+    def __init__(self, stream: BinaryIO, size: int) -> None:
+        self.stream = stream
+        self.left = size
+
+    def read(self, n: int = -1) -> bytes:
+        n = self.left if n < 0 else min(n, self.left)
+        data = self.stream.read(n)
+        self.left -= len(data)
+        return data
+
+
+# A compressed tar can only be read forward, so the last one opened is kept open: members read in order
+# then cost one pass over the archive in all, rather than a pass from the start for each member.
+# It is keyed by process too, since a forked worker shares the file offset of its parent's copy.
+_tar_lock = threading.Lock()
+_open_tar: Optional[tuple[int, str, tarfile.TarFile]] = None
+
+
+@contextmanager
+def _tar_content(archive_path: str) -> Iterator[BinaryIO]:
+    """Yields the uncompressed content stream of a tar archive."""
+    global _open_tar
+    with _tar_lock:
+        if _open_tar is None or _open_tar[:2] != (os.getpid(), archive_path):
+            if _open_tar is not None and _open_tar[0] == os.getpid():
+                _open_tar[2].close()
+            _open_tar = os.getpid(), archive_path, tarfile.open(archive_path, "r:*")
+        yield _open_tar[2].fileobj
+
+
+def is_pdf(name: str) -> bool:
+    return fnmatch(path.basename(name), "*.pdf")
+
+
+def is_zip(name: str) -> bool:
+    return any(fnmatch(path.basename(name), pattern) for pattern in ZIP_PATTERNS)
+
+
+def iter_zip_members(archive_path: str) -> Iterator[PdfSource]:
+    """Lists the PDF members of a zip archive, in the order they are stored."""
+    with zipfile.ZipFile(archive_path) as archive:
+        members = sorted(archive.infolist(), key=lambda info: info.header_offset)
+    for info in members:
+        if info.is_dir() or not is_pdf(info.filename):
+            continue
+        yield PdfSource(
+            name=path.join(archive_path, info.filename),
+            size=info.file_size,
+            mtime=time.mktime(info.date_time + (0, 0, -1)),
+            archive=archive_path,
+            member=info.filename,
+        )
+
+
+def iter_tar_members(archive_path: str) -> Iterator[PdfSource]:
+    """Lists the PDF members of a tar archive, compressed or not, in a single sequential pass."""
+    with tarfile.open(archive_path, "r|*") as archive:
+        for info in archive:
+            if not info.isfile() or not is_pdf(info.name):
+                continue
+            yield PdfSource(
+                name=path.join(archive_path, info.name),
+                size=info.size,
+                mtime=info.mtime,
+                archive=archive_path,
+                member=info.name,
+                offset=info.offset_data,
+            )
+
+
+def iter_pdf_sources(folder: str) -> Iterator[PdfSource]:
+    """Yields the loose PDFs in a folder along with the PDFs inside its zip and tar archives.
+    Archive members are only read when they are scraped, one at a time, and nothing is extracted to disk
+    beyond the temporary spool of a large member.
+    """
+    for file in sorted(listdir(folder)):
+        path_name = path.join(folder, file)
+        if is_pdf(file):
+            file_stat = stat(path_name)
+            yield PdfSource(path_name, file_stat.st_size, file_stat.st_mtime)
+        elif is_zip(file):
+            yield from iter_zip_members(path_name)
+        elif any(fnmatch(file, pattern) for pattern in TAR_PATTERNS):
+            yield from iter_tar_members(path_name)
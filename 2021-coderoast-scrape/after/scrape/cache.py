@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+CHUNK_SIZE = 1 << 20
+TEMP_SUFFIX = ".tmp"
+
+
+def file_digest(path_name: str) -> str:
+    """Returns the sha256 hex digest of a file's content, read in chunks."""
+    with open(path_name, "rb") as file:
+        return stream_digest(file)
+
+
+def stream_digest(file: BinaryIO) -> str:
+    """Returns the sha256 hex digest of a seekable file's content, from the start, read in chunks."""
+    file.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """The DiskCache class keeps one file per key under a directory.
+    Entries are written to a temporary file and renamed into place, so concurrent
+    processes sharing the directory only ever see complete entries.
+    Once the directory grows past max_bytes, the least recently used entries are evicted.
+    The directory is only walked when the running total of bytes written says it may be too big.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.used_bytes: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """Opens the entry for reading and marks it as recently used, or returns None on a miss."""
+        try:
+            file = open(self.path(key), "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            pass  # Evicted by another process; the open handle stays readable.
+        return file
+
+    @contextmanager
+    def write(self, key: str) -> Iterator[BinaryIO]:
+        """Yields a file to write the entry into. The entry only appears once the block exits cleanly."""
+        destination = self.path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(
+            dir=os.path.dirname(destination), suffix=TEMP_SUFFIX
+        )
+        try:
+            with os.fdopen(fd, "wb") as file:
+                yield file
+                size = file.tell()
+            os.replace(temp_name, destination)
+        except BaseException:
+            os.remove(temp_name)
+            raise
+        if self.used_bytes is not None:
+            self.used_bytes += size
+        if self.used_bytes is None or self.used_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(TEMP_SUFFIX):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path_name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path_name)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.used_bytes = total
+
+
+class PageCache:
+    """The PageCache class stores the extracted text of each page of a PDF.
+    Entries are keyed by the file's content hash together with the extraction parameters,
+    so a renamed copy of a paper is a hit and a change of parameters is a miss.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.store = DiskCache(directory, max_bytes)
+
+    @staticmethod
+    def key(content_digest: str, params: dict) -> str:
+        digest = hashlib.sha256(content_digest.encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Optional[Iterator[str]]:
+        """Returns an iterator over the cached pages, or None on a miss."""
+        file = self.store.open(key)
+        if file is None:
+            return None
+        return self._read_pages(file)
+
+    @staticmethod
+    def _read_pages(file: BinaryIO) -> Iterator[str]:
+        with file:
+            for line in file:
+                yield json.loads(line)
+
+    def record(self, key: str, pages: Iterable[str]) -> Iterator[str]:
+        """Passes the pages through while writing them to the entry.
+        The entry is only committed if every page has been consumed.
+        """
+        with self.store.write(key) as file:
+            for page in pages:
+                file.write(json.dumps(page).encode() + b"\n")
+                yield page
+
+
+class ResponseCache:
+    """The ResponseCache class stores the body of each search response from a web service.
+    Entries are keyed by the endpoint and the querystring, with the search text trimmed and lowercased,
+    since DOIs and publication IDs are not case sensitive.
+    An entry older than ttl seconds is treated as a miss, and is overwritten by the next response.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: Optional[float] = None) -> None:
+        self.store = DiskCache(directory, max_bytes)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(url: str, querystring: dict) -> str:
+        normalized = {
+            **querystring,
+            "search_text": str(querystring.get("search_text", "")).strip().lower(),
+        }
+        digest = hashlib.sha256(url.encode())
+        digest.update(json.dumps(normalized, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Optional[str]:
+        """Returns the cached body, or None on a miss or an expired entry."""
+        file = self.store.open(key)
+        if file is None:
+            return None
+        with file:
+            entry = json.load(file)
+        if self.ttl is not None and time.time() - entry["time"] > self.ttl:
+            return None
+        return entry["body"]
+
+    def save(self, key: str, body: str) -> None:
+        with self.store.write(key) as file:
+            file.write(json.dumps({"time": time.time(), "body": body}).encode())
@@ -1,5 +1,6 @@
 import json
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -13,6 +14,58 @@ class ScrapeConfig:
     research_words: str
     bycatch_words: str
     target_words: str
+    workers: int = 1
+    cache_dir: Optional[str] = None
+    cache_max_bytes: int = 1 << 30
+    max_document_bytes: Optional[int] = None
+    tokenizer: str = "fast"
+    page_workers: int = 1
+    page_parallel_threshold: int = 200
+    manifest_file: Optional[str] = None
+    manifest_save_every: int = 100
+    triage_pages: int = 0
+    triage_accept: int = 3
+    triage_reject: int = -2
+    doc_timeout: Optional[float] = None
+    doc_max_memory: Optional[int] = None
+    quarantine_file: str = "quarantine.jsonl"
+    dimensions_concurrency: int = 8
+    dimensions_batch_size: int = 20
+    http_connect_timeout: float = 10.0
+    http_read_timeout: float = 60.0
+    http_retries: int = 3
+    http_backoff: float = 0.5
+    http_pool_size: int = 10
+    request_rate: float = 1.0
+    request_burst: int = 1
+    min_request_rate: float = 0.1
+    max_request_rate: float = 10.0
+    rate_increase: float = 0.05
+    rate_decrease: float = 0.5
+    throttle_retries: int = 5
+    response_cache_dir: Optional[str] = None
+    response_cache_max_bytes: int = 1 << 28
+    response_cache_ttl: Optional[float] = 30 * 24 * 60 * 60
+    cache_only: bool = False
+    download_workers: int = 4
+    download_chunk_size: int = 1 << 16
+    download_attempts: int = 3
+    download_index: str = "download_index.sqlite"
+    link_parser: str = "stream"
+    crawl_db: str = "crawl.sqlite"
+    crawl_nodes_file: str = "crawl_nodes.jsonl"
+    crawl_edges_file: str = "crawl_edges.csv"
+    crawl_max_depth: int = 2
+    crawl_max_nodes: int = 1000
+    crawl_priority: str = "breadth"
+    read_chunk_size: int = 10000
+    score_window: int = 1000
+    queue_size: int = 1000
+    export_batch_size: int = 1000
+    journal_file: str = "journal.jsonl"
+    journal_sync_every: int = 100
+    run_report: str = "run_report.json"
+    prometheus_textfile: Optional[str] = None
 
 
 def read_config(config_file: str) -> ScrapeConfig:
@@ -0,0 +1,238 @@
+"""Crawls the citation graph outward from a set of seed DOIs or publication IDs.
+
+Run it from the after/ directory:
+
+    python -m scrape.crawl 10.1000/xyz123 pub.1012345678
+
+Stopping the crawl and running it again carries on where it left off.
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+from typing import Iterable, Optional
+
+from scrape.config import ScrapeConfig, read_config
+from scrape.json import JSONScrape, build_json_scraper
+from scrape.lexicon import load_lexicon, normalize_term, read_terms
+from scrape.log import log_msg
+from scrape.lookup import search_all
+from scrape.scraper import ScrapeResult
+
+PRIORITIES = ("breadth", "times_cited", "wordscore")
+SEED_PRIORITY = 1e18
+
+
+class CrawlStore:
+    """The CrawlStore class keeps the crawl's visited set and frontier in SQLite, so memory use
+    does not grow with the crawl and an interrupted crawl can be resumed.
+    Every publication seen is a row. Its status is queued until it is taken off the frontier,
+    running while it is being looked up, and done or failed once its outcome has been written out.
+    A seed given by DOI is also marked seen under its publication ID, so it is not crawled twice.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db = sqlite3.connect(db_file)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS nodes (
+                id TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                priority REAL NOT NULL,
+                seq INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued'
+            );
+            CREATE INDEX IF NOT EXISTS frontier ON nodes (status, priority DESC, seq);
+            """
+        )
+        # Lookups that were cut off by the last interruption are queued again.
+        self.db.execute("UPDATE nodes SET status = 'queued' WHERE status = 'running'")
+        self.db.commit()
+        self.seq = self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM nodes").fetchone()[0]
+
+    def enqueue(self, node_id: str, depth: int, priority: float) -> None:
+        """Adds a publication to the frontier, unless it has been seen before."""
+        self.seq += 1
+        self.db.execute(
+            "INSERT OR IGNORE INTO nodes (id, depth, priority, seq) VALUES (?, ?, ?, ?)",
+            (node_id, depth, priority, self.seq),
+        )
+
+    def mark(self, node_id: str, status: str) -> None:
+        self.db.execute("UPDATE nodes SET status = ? WHERE id = ?", (status, node_id))
+
+    def alias(self, node_id: str, depth: int) -> None:
+        self.enqueue(node_id, depth, 0)
+        self.db.execute(
+            "UPDATE nodes SET status = 'seen' WHERE id = ? AND status = 'queued'", (node_id,)
+        )
+
+    def take(self, limit: int) -> list[tuple[str, int]]:
+        """Takes the highest priority publications off the frontier, oldest first among equals."""
+        rows = self.db.execute(
+            "SELECT id, depth FROM nodes WHERE status = 'queued'"
+            " ORDER BY priority DESC, seq LIMIT ?",
+            (limit,),
+        ).fetchall()
+        self.db.executemany(
+            "UPDATE nodes SET status = 'running' WHERE id = ?", [(node_id,) for node_id, _ in rows]
+        )
+        self.db.commit()
+        return rows
+
+    def crawled(self) -> int:
+        return self.db.execute(
+            "SELECT COUNT(*) FROM nodes WHERE status IN ('done', 'failed')"
+        ).fetchone()[0]
+
+    def commit(self) -> None:
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class WordScorer:
+    """Scores a publication's title and abstract the way PDFScrape scores a paper:
+    the number of target terms found, less the number of bycatch terms found.
+    """
+
+    def __init__(self, research_words: str, bycatch_words: str, target_words: str) -> None:
+        self.lexicon = load_lexicon(research_words, bycatch_words, target_words)
+        self.bycatch_words = read_terms(bycatch_words)
+        self.target_words = read_terms(target_words)
+
+    def __call__(self, row: ScrapeResult) -> int:
+        text = normalize_term(f"{row.get('title', '')} {row.get('abstract', '')}")
+        terms = self.lexicon.count(text).keys()
+        return len(self.target_words & terms) - len(self.bycatch_words & terms)
+
+
+class CitationCrawler:
+    """The CitationCrawler class looks up publications in waves taken off the frontier,
+    writes each one out as a node with an edge to every paper it cites, and queues the cited papers.
+    With breadth priority, the crawl goes one depth at a time. With times_cited or wordscore priority,
+    the papers cited by the most cited, or most relevant, publications found so far are crawled first.
+    Nodes and edges are flushed to their files before each wave is marked done, so the output is usable
+    whenever the crawl stops, at the cost of a wave being written twice if it stops in between.
+    """
+
+    def __init__(
+        self,
+        scraper: JSONScrape,
+        store: CrawlStore,
+        nodes_file: str,
+        edges_file: str,
+        max_depth: int = 2,
+        max_nodes: int = 1000,
+        priority: str = "breadth",
+        scorer: Optional[WordScorer] = None,
+        concurrency: int = 1,
+        batch_size: int = 1,
+    ) -> None:
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}, not {priority!r}")
+        if priority == "wordscore" and scorer is None:
+            raise ValueError("wordscore priority needs a scorer")
+        self.scraper = scraper
+        self.store = store
+        self.nodes_file = nodes_file
+        self.edges_file = edges_file
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.priority = priority
+        self.scorer = scorer
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+
+    def child_priority(self, row: ScrapeResult, score: Optional[int], depth: int) -> float:
+        if self.priority == "breadth":
+            return -(depth + 1)
+        if self.priority == "times_cited":
+            return float(row.get("times_cited") or 0)
+        return float(score)
+
+    def run(self, seeds: Iterable[str]) -> int:
+        """Crawls until the frontier is empty or max_nodes publications have been crawled,
+        counting those of earlier runs. Returns the number crawled in this run.
+        """
+        for seed in seeds:
+            self.store.enqueue(seed, 0, SEED_PRIORITY)
+        self.store.commit()
+        wave_size = self.concurrency * max(1, self.batch_size) * 2
+        crawled = 0
+        with open(self.nodes_file, "a") as nodes, open(self.edges_file, "a", newline="") as edges:
+            edge_writer = csv.writer(edges)
+            if edges.tell() == 0:
+                edge_writer.writerow(["source", "target"])
+            while (budget := self.max_nodes - self.store.crawled()) > 0:
+                wave = self.store.take(min(wave_size, budget))
+                if not wave:
+                    break
+                results = search_all(
+                    self.scraper,
+                    [node_id for node_id, _ in wave],
+                    self.concurrency,
+                    self.batch_size,
+                )
+                for (node_id, depth), row in zip(wave, results):
+                    if row is not None:
+                        self.write_node(row, node_id, depth, nodes, edge_writer)
+                nodes.flush()
+                edges.flush()
+                for (node_id, depth), row in zip(wave, results):
+                    self.store.mark(node_id, "failed" if row is None else "done")
+                    if row is not None and row.get("id") and row["id"] != node_id:
+                        self.store.alias(row["id"], depth)
+                self.store.commit()
+                crawled += len(wave)
+                log_msg(
+                    f"\n[sciscraper]: Crawled {self.store.crawled()} of at most {self.max_nodes} publications.\n"
+                )
+        return crawled
+
+    def write_node(
+        self, row: ScrapeResult, node_id: str, depth: int, nodes, edge_writer
+    ) -> None:
+        score = self.scorer(row) if self.scorer else None
+        source = row.get("id") or node_id
+        node = {"id": source, "searched": node_id, "depth": depth, "wordscore": score, **row}
+        nodes.write(json.dumps(node) + "\n")
+        cited = row.get("cited_dimensions_ids") or []
+        for cited_id in cited:
+            edge_writer.writerow([source, cited_id])
+            if depth < self.max_depth:
+                self.store.enqueue(cited_id, depth + 1, self.child_priority(row, score, depth))
+
+
+def build_crawler(config: ScrapeConfig) -> CitationCrawler:
+    return CitationCrawler(
+        scraper=build_json_scraper(config),
+        store=CrawlStore(config.crawl_db),
+        nodes_file=config.crawl_nodes_file,
+        edges_file=config.crawl_edges_file,
+        max_depth=config.crawl_max_depth,
+        max_nodes=config.crawl_max_nodes,
+        priority=config.crawl_priority,
+        scorer=WordScorer(config.research_words, config.bycatch_words, config.target_words),
+        concurrency=config.dimensions_concurrency,
+        batch_size=config.dimensions_batch_size,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("seeds", nargs="*", help="DOIs or publication IDs to start from")
+    parser.add_argument("--config", default="./config.json")
+    args = parser.parse_args()
+
+    crawler = build_crawler(read_config(args.config))
+    try:
+        crawler.run(args.seeds)
+    finally:
+        crawler.store.close()
+
+
+if __name__ == "__main__":
+    main()
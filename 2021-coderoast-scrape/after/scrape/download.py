@@ -0,0 +1,193 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Sequence
+
+from requests.exceptions import HTTPError, RequestException
+
+from scrape.config import ScrapeConfig
+from scrape.http import HttpClient
+from scrape.log import log_msg
+from scrape.metrics import METRICS
+
+CHUNK_SIZE = 1 << 16
+PARTIAL_SUFFIX = ".part"
+# Where a partial file came from, and the validators its server sent, so it is only resumed from the same file.
+ORIGIN_SUFFIX = ".part.json"
+CONTENT_RANGE = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
+def content_range(response) -> tuple[Optional[int], Optional[int]]:
+    """Returns the first byte of a partial response, and the full size of the file if the server knows it."""
+    match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+    if match is None:
+        return None, None
+    return int(match.group(1)), None if match.group(2) == "*" else int(match.group(2))
+
+
+def content_length(response) -> Optional[int]:
+    length = response.headers.get("Content-Length", "")
+    return int(length) if length.isdigit() else None
+
+
+def read_origin(partial: str) -> dict:
+    try:
+        with open(partial[: -len(PARTIAL_SUFFIX)] + ORIGIN_SUFFIX) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_origin(partial: str, url: str, response) -> None:
+    origin = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    with open(partial[: -len(PARTIAL_SUFFIX)] + ORIGIN_SUFFIX, "w") as file:
+        json.dump(origin, file)
+
+
+def remove_origin(partial: str) -> None:
+    try:
+        os.remove(partial[: -len(PARTIAL_SUFFIX)] + ORIGIN_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+class Downloader:
+    """The Downloader class downloads files on a bounded pool of threads, streaming each one to disk in chunks.
+    A file is written next to its destination with a .part suffix, and only renamed into place once complete,
+    so a destination that exists is always a whole file.
+    A download that is cut off carries on from the end of its partial file with an HTTP Range request,
+    whether on the next attempt or in a later run. A server that ignores the range sends the whole file again.
+    The range is sent with If-Range and the validator the partial file was first served with,
+    so a mirror holding a different file sends all of it instead of the rest of it.
+    A partial file whose server sent no validator is only resumed from the url it came from, and restarted otherwise.
+    A destination that is already queued is not downloaded twice: submitting it again returns the same future.
+    """
+
+    def __init__(
+        self,
+        client: HttpClient,
+        workers: int = 4,
+        chunk_size: int = CHUNK_SIZE,
+        attempts: int = 3,
+    ) -> None:
+        self.client = client
+        self.chunk_size = chunk_size
+        self.attempts = attempts
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        # Callers block once a few downloads per worker are waiting, rather than queueing without bound.
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.lock = threading.Lock()
+        self.queued: dict[str, Future] = {}
+
+    def submit(self, urls: Sequence[str], destination: str) -> Future:
+        """Queues the download of one file, trying each of its urls in turn until one succeeds."""
+        key = os.path.abspath(destination)
+        with self.lock:
+            if key in self.queued:
+                return self.queued[key]
+        self.slots.acquire()
+        with self.lock:
+            if key in self.queued:
+                self.slots.release()
+                return self.queued[key]
+            future = self.pool.submit(self.download, urls, destination)
+            self.queued[key] = future
+        future.add_done_callback(lambda done: self.finished(key, done))
+        return future
+
+    def finished(self, key: str, done: Future) -> None:
+        with self.lock:
+            del self.queued[key]
+        self.slots.release()
+        if done.exception() is not None:
+            METRICS.count("downloads_failed")
+            log_msg(f"\n[sciscraper]: The download to {key} failed. Cause of error: {done.exception()}\n")
+
+    def download(self, urls: Sequence[str], destination: str) -> Optional[str]:
+        """Downloads the file to destination and returns its path, or None if every url failed."""
+        if os.path.exists(destination):
+            return destination
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+        for url in urls:
+            for attempt in range(self.attempts):
+                try:
+                    with METRICS.stage("download"):
+                        self.fetch(url, destination)
+                    return destination
+                except HTTPError as e:
+                    log_msg(f"\n[sciscraper]: {url} answered {e.response.status_code}.\n")
+                    if e.response.status_code < 500:
+                        break
+                except (RequestException, IncompleteDownload) as e:
+                    log_msg(
+                        f"\n[sciscraper]: Download {attempt + 1} of {url} was cut off. Cause of error: {e}\n"
+                    )
+        METRICS.count("downloads_failed")
+        return None
+
+    def fetch(self, url: str, destination: str) -> None:
+        partial = destination + PARTIAL_SUFFIX
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        # Ranges and lengths count the bytes as stored, so the file must not come compressed.
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            origin = read_origin(partial)
+            validator = origin.get("etag") or origin.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+            elif origin.get("url") != url:
+                # Nothing says the bytes so far belong to the file at this url.
+                offset = 0
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        self.client.pace(url)
+        with self.client.get(url, stream=True, allow_redirects=True, headers=headers) as response:
+            if response.status_code == 416 and offset:
+                # The partial file already holds every byte there is.
+                os.replace(partial, destination)
+                remove_origin(partial)
+                return
+            response.raise_for_status()
+            if response.status_code == 206:
+                start, size = content_range(response)
+                if start != offset:
+                    os.remove(partial)
+                    remove_origin(partial)
+                    raise IncompleteDownload(f"{url} sent a range other than the one asked for")
+                METRICS.count("downloads_resumed")
+            else:
+                # The server ignored the range, if there was one, or the file changed, and sent the whole file.
+                offset, size = 0, content_length(response)
+                write_origin(partial, url, response)
+            with open(partial, "ab" if offset else "wb") as file:
+                for chunk in response.iter_content(self.chunk_size):
+                    file.write(chunk)
+                    METRICS.count("bytes_downloaded", len(chunk))
+                written = file.tell()
+        if size is not None and written != size:
+            raise IncompleteDownload(f"{written} of {size} bytes of {url} arrived")
+        os.replace(partial, destination)
+        remove_origin(partial)
+
+    def close(self) -> None:
+        """Waits for the queued downloads to finish."""
+        self.pool.shutdown(wait=True)
+
+
+def build_downloader(config: ScrapeConfig, client: HttpClient) -> Downloader:
+    return Downloader(
+        client,
+        workers=config.download_workers,
+        chunk_size=config.download_chunk_size,
+        attempts=config.download_attempts,
+    )
@@ -1,21 +1,103 @@
 import logging
+import os
 import random
-from typing import Optional
+from typing import Any, Iterable, Optional
 from datetime import datetime
 import pandas as pd
 
 from scrape.dir import change_dir
+from scrape.metrics import METRICS
 
 
-def export(dataframe: Optional[pd.DataFrame], export_dir: str):
+def export_name() -> str:
     now = datetime.now()
     date = now.strftime("%y%m%d")
+    print_id = random.randint(0, 100)
+    return f"{date}_DIMScrape_Refactor_{print_id}.csv"
+
 
+def export(dataframe: Optional[pd.DataFrame], export_dir: str):
     with change_dir(export_dir):
-        print_id = random.randint(0, 100)
-        export_name = f"{date}_DIMScrape_Refactor_{print_id}.csv"
-        msg_spreadsheetexported = f"\n[sciscraper]: A spreadsheet was exported as {export_name} in {export_dir}.\n"
-        dataframe.to_csv(export_name)
+        name = export_name()
+        msg_spreadsheetexported = f"\n[sciscraper]: A spreadsheet was exported as {name} in {export_dir}.\n"
+        with METRICS.stage("export"):
+            dataframe.to_csv(name)
+        METRICS.count("rows_exported", len(dataframe))
         print(dataframe.head())
         logging.info(msg_spreadsheetexported)
         print(msg_spreadsheetexported)
+
+
+class CSVBatchWriter:
+    """The CSVBatchWriter class appends rows to a CSV file batch_size rows at a time,
+    so a long run keeps a flat memory footprint and its partial results are on disk as it goes.
+    The columns are those of the first batch, and the file looks the same as one written by export.
+    """
+
+    def __init__(self, path_name: str, batch_size: int = 1000) -> None:
+        self.path_name = path_name
+        self.batch_size = batch_size
+        self.batch: list[Any] = []
+        self.columns: Optional[pd.Index] = None
+        self.rows_written = 0
+
+    def write(self, row: Any) -> None:
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.batch:
+            return
+        index = range(self.rows_written, self.rows_written + len(self.batch))
+        dataframe = pd.DataFrame(self.batch, index=index)
+        first = self.columns is None
+        if first:
+            self.columns = dataframe.columns
+        else:
+            dataframe = dataframe.reindex(columns=self.columns)
+        with METRICS.stage("export"), open(self.path_name, "w" if first else "a", newline="") as f:
+            dataframe.to_csv(f, header=first)
+        METRICS.count("rows_exported", len(self.batch))
+        self.rows_written += len(self.batch)
+        self.batch = []
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "CSVBatchWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def export_stream(rows: Iterable[Any], export_dir: str, batch_size: int = 1000) -> Optional[str]:
+    """Writes the rows to a new spreadsheet in export_dir as they arrive, batch_size rows at a time.
+    Returns the path of the spreadsheet, or None when there were no rows to write.
+    The rows are closed once they have been written, or the export fails.
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    path_name = os.path.join(export_dir, export_name())
+    try:
+        with CSVBatchWriter(path_name, batch_size) as writer:
+            for row in rows:
+                writer.write(row)
+    finally:
+        # Stops a prefetching producer if the export fails part way.
+        close = getattr(rows, "close", None)
+        if close is not None:
+            close()
+    if not writer.rows_written:
+        msg_nothingexported = "\n[sciscraper]: No rows came back, so no spreadsheet was exported.\n"
+        logging.info(msg_nothingexported)
+        print(msg_nothingexported)
+        return None
+    msg_spreadsheetexported = (
+        f"\n[sciscraper]: A spreadsheet of {writer.rows_written} rows was exported as"
+        f" {os.path.basename(path_name)} in {export_dir}.\n"
+    )
+    print(pd.read_csv(path_name, index_col=0, nrows=5))
+    logging.info(msg_spreadsheetexported)
+    print(msg_spreadsheetexported)
+    return path_name
@@ -1,47 +1,203 @@
-from fnmatch import fnmatch
-from os import listdir, path
+from collections import deque
+from typing import Iterator, Optional
 
 import pandas as pd
-from tqdm import tqdm
 
-from scrape.pdf import PDFScrape
-from scrape.scraper import Scraper
+from scrape.archive import PdfSource, iter_pdf_sources
+from scrape.json import KEYS, JSONScrape
+from scrape.journal import Journal
+from scrape.log import log_msg
+from scrape.lookup import search_all
+from scrape.manifest import Manifest, result_from_json, result_to_json, scoring_fingerprint
+from scrape.metrics import METRICS
+from scrape.parallel import iter_scrape_pdf_files, scrape_pdf_files
 from scrape.config import ScrapeConfig
+from scrape.scraper import ScrapeResult
+from scrape.stream import chunked, prefetch, read_column
 
 
 def fetch_terms_from_pdf_files(config: ScrapeConfig) -> pd.DataFrame:
-    search_terms = [
-        path.join(config.paper_folder, file)
-        for file in listdir(config.paper_folder)
-        if fnmatch(path.basename(file), "*.pdf")
-    ]
-    scraper = PDFScrape(
-        research_words=config.research_words,
-        bycatch_words=config.bycatch_words,
-        target_words=config.target_words,
+    """Scrapes the PDFs in config.paper_folder, including those inside zip and tar archives."""
+    if config.manifest_file:
+        return fetch_terms_incrementally(config)
+    with METRICS.stage("fetch_pdf_files"):
+        results = scrape_pdf_files(iter_pdf_sources(config.paper_folder), config)
+    return pd.DataFrame([result for result in results if result is not None])
+
+
+def stream_terms_from_pdf_files(
+    config: ScrapeConfig, journal: Optional[Journal] = None
+) -> Iterator[ScrapeResult]:
+    """Yields the result of each PDF in config.paper_folder, in order, as soon as its window of
+    config.score_window files has been scored. The results are handed over through a queue of
+    at most config.queue_size, so scraping carries on while they are written out.
+    With a journal, each file is journaled by its content hash as it is finished, and the files
+    an earlier run finished are not scraped again: their journaled results come first instead.
+    With a manifest, the whole corpus is diffed against it first, and its results follow.
+    """
+    if config.manifest_file:
+        results = iter(incremental_results(config))
+    else:
+        results = METRICS.timed("fetch_pdf_files", journaled_pdf_results(config, journal))
+    return prefetch((result for result in results if result is not None), config.queue_size)
+
+
+def journaled_pdf_results(
+    config: ScrapeConfig, journal: Optional[Journal]
+) -> Iterator[Optional[ScrapeResult]]:
+    sources = iter_pdf_sources(config.paper_folder)
+    if journal is None:
+        yield from iter_scrape_pdf_files(sources, config, config.score_window)
+        return
+    for _, row in journal.rows():
+        yield result_from_json(row)
+    # Results are only journaled once their window is scored, so the window is kept to one sync interval:
+    # a crash then loses no more files than the journal's own buffering would.
+    window = min(config.score_window, journal.sync_every)
+    # The keys of the files on their way through the scraper, which yields their results in order.
+    keys: deque[str] = deque()
+
+    def unfinished() -> Iterator[PdfSource]:
+        for source in sources:
+            key = source.digest()
+            if key in journal:
+                METRICS.count("documents_resumed")
+                continue
+            keys.append(key)
+            yield source
+
+    for result in iter_scrape_pdf_files(unfinished(), config, window):
+        journal.record(keys.popleft(), None if result is None else result_to_json(result))
+        yield result
+
+
+def fetch_terms_incrementally(config: ScrapeConfig) -> pd.DataFrame:
+    """Only scrapes the files that were added or changed since the manifest was last saved.
+    Their results are merged with the recorded results of the unchanged files.
+    The manifest is saved every manifest_save_every new results, and once more however the run ends.
+    """
+    results = incremental_results(config)
+    return pd.DataFrame([result for result in results if result is not None])
+
+
+def incremental_results(config: ScrapeConfig) -> list[Optional[ScrapeResult]]:
+    manifest = Manifest(config.manifest_file, scoring_fingerprint(config))
+    search_terms = []
+    changed = []
+    with METRICS.stage("manifest"):
+        for source in iter_pdf_sources(config.paper_folder):
+            search_terms.append(source.name)
+            if not manifest.is_current(source):
+                changed.append(source)
+        deleted = manifest.prune(search_terms)
+    log_msg(
+        f"\n[sciscraper]: {len(changed)} new or changed, {len(search_terms) - len(changed)}"
+        f" unchanged and {deleted} deleted files in {config.paper_folder}.\n"
     )
-    return pd.DataFrame([scraper.scrape(file) for file in tqdm(search_terms)])
+    recorded = 0
+    try:
+        with METRICS.stage("fetch_pdf_files"):
+            results = iter_scrape_pdf_files(changed, config, config.score_window)
+            # The results come first, so that they are run to their end and log their triage summary.
+            for result, source in zip(results, changed):
+                if result is not None:
+                    manifest.record(source, result)
+                    recorded += 1
+                    if recorded % config.manifest_save_every == 0:
+                        manifest.save()
+    finally:
+        # Whatever was scraped before a crash or an interrupt is kept for the next run.
+        manifest.save()
+    return [manifest.result(file) for file in search_terms]
 
 
-def fetch_terms_from_doi(target: str, scraper: Scraper) -> pd.DataFrame:
+def stream_terms_from_doi(
+    target: str,
+    scraper: JSONScrape,
+    concurrency: int = 1,
+    batch_size: int = 1,
+    chunk_size: int = 10000,
+    queue_size: int = 1000,
+    journal: Optional[Journal] = None,
+) -> Iterator[ScrapeResult]:
+    """Yields the row of every DOI in the target CSV that was found, in order.
+    The CSV is read chunk_size rows at a time, and each chunk is looked up with up to concurrency
+    searches in flight and up to batch_size DOIs in each search. The rows are handed over through
+    a queue of at most queue_size, so the next chunk is looked up while they are written out.
+    With a journal, each DOI is journaled once its chunk has been looked up, and the DOIs
+    an earlier run finished are not looked up again: their journaled rows come first instead.
+    """
     print(f"\n[sciscraper]: Getting entries from file: {target}")
-    with open(target, newline="") as f:
-        df = [doi for doi in pd.read_csv(f, usecols=["DOI"])["DOI"]]
-        search_terms = [search_text for search_text in df if search_text is not None]
-        return pd.DataFrame(
-            [scraper.scrape(search_text) for search_text in tqdm(search_terms)]
-        )
-
-
-def fetch_terms_from_pubid(target: pd.DataFrame, scraper: Scraper) -> pd.DataFrame:
-    df = target.explode("cited_dimensions_ids", "title")
-    search_terms = [
-        search_text
-        for search_text in df["cited_dimensions_ids"]
-        if search_text is not None
-    ]
-    src_title = pd.Series(df["title"])
-
-    return pd.DataFrame(
-        [scraper.scrape(search_text) for search_text in tqdm(search_terms)]
-    ).join(src_title)
+
+    def results() -> Iterator[ScrapeResult]:
+        dois = read_column(target, "DOI", chunk_size)
+        if journal is not None:
+            yield from (row for _, row in journal.rows())
+            dois = (doi for doi in dois if doi not in journal)
+        for chunk in chunked(dois, chunk_size):
+            found = search_all(scraper, chunk, concurrency, batch_size)
+            for doi, result in zip(chunk, found):
+                if journal is not None:
+                    journal.record(doi, result)
+                if result is not None:
+                    yield result
+
+    return prefetch(METRICS.timed("fetch_doi", results()), queue_size)
+
+
+def fetch_terms_from_doi(
+    target: str,
+    scraper: JSONScrape,
+    concurrency: int = 1,
+    batch_size: int = 1,
+    journal: Optional[Journal] = None,
+) -> pd.DataFrame:
+    """Looks up every DOI in the target CSV, with up to concurrency searches in flight at once
+    and up to batch_size DOIs in each search."""
+    rows = stream_terms_from_doi(target, scraper, concurrency, batch_size, journal=journal)
+    return pd.DataFrame(list(rows))
+
+
+def fetch_terms_from_pubid(
+    target: pd.DataFrame,
+    scraper: JSONScrape,
+    concurrency: int = 1,
+    batch_size: int = 1,
+    journal: Optional[Journal] = None,
+) -> pd.DataFrame:
+    """Looks up the papers cited by each paper in target, which holds the rows of an earlier lookup.
+    A paper cited by many of them is only looked up once, and its row is then joined back onto
+    every citing paper by its publication ID, with the citing paper's title as src_title.
+    Citations whose lookup failed are left out.
+    With a journal, the papers an earlier run finished are taken from it rather than looked up again.
+    """
+    citations = (
+        target[["title", "cited_dimensions_ids"]]
+        .explode("cited_dimensions_ids")
+        .rename(columns={"title": "src_title", "cited_dimensions_ids": "cited_id"})
+    )
+    citations = citations[citations["cited_id"].notna() & (citations["cited_id"] != "")]
+    search_terms = list(dict.fromkeys(citations["cited_id"]))
+    METRICS.count("citations", len(citations))
+    METRICS.count("unique_citations", len(search_terms))
+    log_msg(
+        f"\n[sciscraper]: {len(citations)} citations of {len(search_terms)} unique papers,"
+        f" a dedup ratio of {len(citations) / max(len(search_terms), 1):.2f}.\n"
+    )
+
+    journaled = dict(journal.rows()) if journal is not None else {}
+    unfinished = [search_text for search_text in search_terms if Journal.key(search_text) not in journaled]
+    with METRICS.stage("fetch_pubid"):
+        results = dict(zip(unfinished, search_all(scraper, unfinished, concurrency, batch_size)))
+    if journal is not None:
+        for search_text, result in results.items():
+            journal.record(search_text, result)
+    rows = (
+        (search_text, results.get(search_text) or journaled.get(Journal.key(search_text)))
+        for search_text in search_terms
+    )
+    cited = pd.DataFrame(
+        [{**result, "cited_id": search_text} for search_text, result in rows if result is not None],
+        columns=[*KEYS, "cited_id"],
+    )
+    return citations.merge(cited, on="cited_id", how="inner").drop(columns="cited_id")
@@ -0,0 +1,115 @@
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from scrape.config import ScrapeConfig
+from scrape.metrics import METRICS
+from scrape.ratelimit import RateController, retry_after_seconds
+
+RETRY_STATUSES = (500, 502, 504)
+# Services answer these when we are going too fast, so they are left to the rate controller.
+THROTTLE_STATUSES = (429, 503)
+
+
+class AccessDenied(Exception):
+    """Raised when a service refuses us outright, or still refuses us after the rate controller has backed off and paused."""
+
+
+def is_throttled(response: requests.Response) -> bool:
+    """A 403 usually means we are not allowed in at all, so it only counts as throttling
+    when it says when to come back."""
+    if response.status_code == 403:
+        return "Retry-After" in response.headers
+    return response.status_code in THROTTLE_STATUSES
+
+
+class HttpClient:
+    """The HttpClient class is the one session that every scraper sends its requests through.
+    Its connection pool keeps connections to each host alive between requests, every request has
+    connect and read timeouts, and idempotent requests that fail on the way, or come back with a
+    server error, are retried with exponential backoff.
+    Each host's pace is set by the rate controller. A throttled request is told to the controller,
+    which slows that host down and pauses it, and is then sent again, up to throttle_retries times.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        pool_size: int = 10,
+        rates: Optional[RateController] = None,
+        throttle_retries: int = 5,
+    ) -> None:
+        self.rates = rates or RateController()
+        self.throttle_retries = throttle_retries
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+            # Retry-After is the rate controller's to act on, across every request to the host.
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.throttle_retries + 1):
+            response = None
+            with METRICS.stage("http", histogram="http_request_seconds"):
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                finally:
+                    METRICS.record_response(response)
+            if not is_throttled(response):
+                if response.status_code < 500:
+                    self.rates.on_success(url)
+                return response
+            if attempt == self.throttle_retries:
+                break
+            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            self.rates.on_throttle(url, response.status_code, retry_after)
+            response.close()
+            self.pace(url)
+        return response
+
+    def pace(self, url: str) -> None:
+        """Waits for this host's turn, for callers that are not already paced by its limiter."""
+        self.rates.limiter(url).wait()
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+def build_http_client(config: ScrapeConfig) -> HttpClient:
+    return HttpClient(
+        connect_timeout=config.http_connect_timeout,
+        read_timeout=config.http_read_timeout,
+        retries=config.http_retries,
+        backoff=config.http_backoff,
+        # Every concurrent Dimensions search or download needs a pooled connection of its own.
+        pool_size=max(config.http_pool_size, config.dimensions_concurrency, config.download_workers),
+        rates=RateController(
+            rate=config.request_rate,
+            burst=config.request_burst,
+            min_rate=config.min_request_rate,
+            max_rate=config.max_request_rate,
+            increase=config.rate_increase,
+            decrease=config.rate_decrease,
+        ),
+        throttle_retries=config.throttle_retries,
+    )
@@ -0,0 +1,111 @@
+import json
+import os
+from typing import Iterator, Optional
+
+from scrape.config import ScrapeConfig
+
+REPAIR_CHUNK_SIZE = 1 << 16
+
+
+class Journal:
+    """The Journal class is an append-only record of the inputs a run has finished, with their result rows,
+    so that an interrupted run can be resumed without redoing them.
+    Each input is one JSON line, keyed by its DOI, publication ID or file hash, trimmed and lowercased.
+    Lines are buffered, and only flushed and fsynced every sync_every records, so a crash loses
+    at most the last few, which the resumed run simply redoes.
+    Inputs that failed are journaled without a row, and are tried again on resume.
+    A run that finishes removes its journal, so a journal left on disk always belongs to a run that did not,
+    and a run that does not resume only starts over from it when told to overwrite it.
+    """
+
+    def __init__(
+        self,
+        journal_file: str,
+        resume: bool = False,
+        sync_every: int = 100,
+        overwrite: bool = False,
+    ) -> None:
+        if not resume and not overwrite and os.path.exists(journal_file) and os.path.getsize(journal_file):
+            raise FileExistsError(
+                f"{journal_file} holds the progress of an earlier run; resume it, or overwrite it to start over"
+            )
+        self.journal_file = journal_file
+        self.sync_every = sync_every
+        self.unsynced = 0
+        self.done: set[str] = set()
+        if resume and os.path.exists(journal_file):
+            self._repair()
+            self.done = {key for key, _ in self._read()}
+        self.file = open(journal_file, "a" if resume else "w")
+
+    @staticmethod
+    def key(text: str) -> str:
+        return str(text).strip().lower()
+
+    def _repair(self) -> None:
+        """Cuts off a line left half written by a crash, so the next record starts on a line of its own."""
+        with open(self.journal_file, "rb+") as file:
+            size = end = file.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - REPAIR_CHUNK_SIZE)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    if start + newline + 1 < size:
+                        file.truncate(start + newline + 1)
+                    return
+                end = start
+            file.truncate(0)
+
+    def __contains__(self, text: str) -> bool:
+        """Checks whether the input was finished by an earlier run. Inputs finished by this run are not counted."""
+        return self.key(text) in self.done
+
+    def rows(self) -> Iterator[tuple[str, dict]]:
+        """Yields the key and row of every input journaled with a result, in the order they were finished."""
+        self.file.flush()
+        yield from self._read()
+
+    def _read(self) -> Iterator[tuple[str, dict]]:
+        with open(self.journal_file) as file:
+            for line in file:
+                entry = json.loads(line)
+                if entry["row"] is not None:
+                    yield entry["key"], entry["row"]
+
+    def record(self, text: str, row: Optional[dict]) -> None:
+        self.file.write(json.dumps({"key": self.key(text), "row": row}) + "\n")
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        self.sync()
+        self.file.close()
+
+    def finish(self) -> None:
+        """Closes and removes the journal once its run has finished, as there is nothing left to resume."""
+        self.close()
+        os.remove(self.journal_file)
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def build_journal(config: ScrapeConfig, resume: bool = False, overwrite: bool = False) -> Journal:
+    return Journal(
+        config.journal_file,
+        resume=resume,
+        sync_every=config.journal_sync_every,
+        overwrite=overwrite,
+    )
@@ -1,12 +1,22 @@
 import json
 import logging
-import time
+import threading
 from json.decoder import JSONDecodeError
-from scrape.scraper import ScrapeResult
+from typing import Optional
 
-import requests
 from requests.exceptions import HTTPError, RequestException
 
+from scrape.cache import ResponseCache
+from scrape.config import ScrapeConfig
+from scrape.http import AccessDenied, HttpClient, build_http_client
+from scrape.log import log_msg
+from scrape.metrics import METRICS
+from scrape.scraper import ScrapeResult
+
+ACCESS_DENIED_STATUSES = (401, 403)
+# Identifiers are packed into one batched search separated by spaces, which the search box reads as alternatives.
+BATCH_SEPARATOR = " "
+
 KEYS = [
     "title",
     "author_list",
@@ -28,48 +38,211 @@ KEYS = [
 class JSONScrape:
     """The JSONScrape class takes the provided string from a prior list comprehension.
     Using that string value, it gets the resulting JSON data, parses it, and then returns a dictionary, which gets appended to a list.
+    Every search waits its turn on the client's limiter for the website, which adapts to how fast the website lets us go.
+    With a response cache, searches that were answered before are read back from disk without waiting,
+    and in cache-only mode nothing is sent to the website at all.
+    A response read while checking whether a search needs a request is held until the search picks it up,
+    so each lookup reads the cache once.
     """
 
-    def scrape(self, search_text: str) -> ScrapeResult:
-        """The download method generates a session and a querystring that gets sent to the website. This returns a JSON entry.
+    def __init__(
+        self,
+        base_url: str,
+        client: Optional[HttpClient] = None,
+        cache: Optional[ResponseCache] = None,
+        cache_only: bool = False,
+    ) -> None:
+        self.base_url = base_url
+        self.client = client or HttpClient()
+        self.limiter = self.client.rates.limiter(base_url)
+        self.cache = cache
+        self.cache_only = cache_only
+        self.read_ahead: dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def querystring(self, search_text: str) -> dict:
+        search_field = "full_search" if search_text.startswith("pub") else "doi"
+        return {
+            "search_mode": "content",
+            "search_text": f"{search_text}",
+            "search_type": "kws",
+            "search_field": f"{search_field}",
+        }
+
+    def cached(self, search_text: str) -> Optional[str]:
+        """Returns the cached response to the search, taking it from needs_request when that already read it."""
+        if self.cache is None:
+            return None
+        with self.lock:
+            body = self.read_ahead.pop(search_text, None)
+        if body is not None:
+            return body
+        return self.cache.load(ResponseCache.key(self.base_url, self.querystring(search_text)))
+
+    def needs_request(self, search_text: str) -> bool:
+        """Whether the search would be sent to the website, and so has to wait on the limiter first.
+        A cached response it finds is kept for the search that follows.
+        """
+        if self.cache_only:
+            return False
+        body = self.cached(search_text)
+        if body is None:
+            return True
+        with self.lock:
+            self.read_ahead[search_text] = body
+        return False
+
+    def scrape(self, search_text: str) -> Optional[ScrapeResult]:
+        if self.needs_request(search_text):
+            self.limiter.wait()
+        return self.search(search_text)
+
+    def search(self, search_text: str) -> Optional[ScrapeResult]:
+        """The search method looks up the querystring in the response cache, or sends it to the website through the shared client. This returns a JSON entry.
         The JSON entry is loaded and specific values are identified for passing along, back to a dataframe.
+        It does not wait on the limiter, and returns None when the search fails.
         """
-        self.sessions = requests.Session()
-        search_field = "full_search" if search_text.startswith("pub") else "doi"
-        self.base_url = URL_DMNSNS
+        querystring = self.querystring(search_text)
         print(
-            f"[sciscraper]: Searching for {search_text} via a {search_field}-style search.",
+            f"[sciscraper]: Searching for {search_text} via a {querystring['search_field']}-style search.",
             end="\r",
         )
+        body = self.cached(search_text)
+        fetched = body is None
+        if body is not None:
+            METRICS.count("response_cache_hits")
+        elif self.cache_only:
+            METRICS.count("response_cache_misses")
+            log_msg(f"\n[sciscraper]: {search_text} is not in the response cache. Skipping it.\n")
+            return None
+        else:
+            body = self.fetch(search_text, querystring)
+            if body is None:
+                return None
+
+        try:
+            docs = json.loads(body)["docs"]
+        except (JSONDecodeError, KeyError, TypeError) as e:
+            METRICS.count("http_errors")
+            print(
+                f"\n[sciscraper]: An error occurred while searching for {search_text}.\
+                \n[sciscraper]: Proceeding to next item in sequence.\
+                Cause of error: {e}\n"
+            )
+            return None
+        if fetched and self.cache is not None:
+            self.cache.save(ResponseCache.key(self.base_url, querystring), body)
+
+        return self.pick(search_text, docs)
+
+    @staticmethod
+    def identifier(doc: dict, search_field: str) -> str:
+        """The DOI of a document found by a DOI search, or its publication ID for a full-text search."""
+        return str(doc.get("doi" if search_field == "doi" else "id", "")).strip().lower()
+
+    @staticmethod
+    def row(doc: dict) -> ScrapeResult:
+        return {_key: doc.get(_key, "") for _key in KEYS}
+
+    def pick(self, search_text: str, docs: list[dict]) -> Optional[ScrapeResult]:
+        """Returns the row of the document the search was for.
+        A full-text search for a publication ID also finds the papers that mention it,
+        so the document whose identifier matches comes first, and otherwise the first one found.
+        """
+        search_field = self.querystring(search_text)["search_field"]
+        for doc in docs:
+            if self.identifier(doc, search_field) == search_text.strip().lower():
+                return self.row(doc)
+        return self.row(docs[0]) if docs else None
+
+    def search_batch(self, search_terms: list[str]) -> list[Optional[ScrapeResult]]:
+        """Sends one search for several identifiers of the same kind, and splits the documents found
+        back out by identifier. Each document found is also cached as the answer to its own search.
+        The results line up with search_terms, with None for the identifiers the response left out,
+        which the caller can then look up one at a time.
+        """
         querystring = {
-            "search_mode": "content",
-            "search_text": f"{search_text}",
-            "search_type": "kws",
-            "search_field": f"{search_field}",
+            **self.querystring(search_terms[0]),
+            "search_text": BATCH_SEPARATOR.join(search_terms),
         }
-        time.sleep(1)
+        search_field = querystring["search_field"]
+        print(
+            f"[sciscraper]: Searching for {len(search_terms)} identifiers via a {search_field}-style search.",
+            end="\r",
+        )
+        METRICS.count("batched_searches", len(search_terms))
+        body = self.fetch(querystring["search_text"], querystring)
+        try:
+            docs = json.loads(body)["docs"] if body is not None else []
+        except (JSONDecodeError, KeyError, TypeError):
+            docs = []
+        found: dict[str, dict] = {}
+        for doc in docs:
+            found.setdefault(self.identifier(doc, search_field), doc)
+        results: list[Optional[ScrapeResult]] = []
+        for search_text in search_terms:
+            doc = found.get(search_text.strip().lower())
+            if doc is None:
+                METRICS.count("batch_misses")
+                results.append(None)
+                continue
+            if self.cache is not None:
+                key = ResponseCache.key(self.base_url, self.querystring(search_text))
+                self.cache.save(key, json.dumps({"docs": [doc]}))
+            results.append(self.row(doc))
+        return results
 
+    def fetch(self, search_text: str, querystring: dict) -> Optional[str]:
+        """Sends the search to the website, returning the body of the response, or None when the request fails.
+        If the website refuses us outright, it raises AccessDenied to end the run.
+        """
         try:
-            r = self.sessions.get(self.base_url, params=querystring)
+            r = self.client.get(self.base_url, params=querystring)
+            METRICS.count("http_bytes", len(r.content))
             r.raise_for_status()
             logging.info(r.status_code)
-            self.docs = json.loads(r.text)["docs"]
+            return r.text
 
-        except (JSONDecodeError, RequestException) as e:
+        except HTTPError as f:
+            METRICS.count("http_errors")
+            if f.response.status_code in ACCESS_DENIED_STATUSES:
+                log_msg(
+                    f"\n[sciscraper]: Access to {self.base_url} denied while searching for {search_text}.\
+                    \n[sciscraper]: Terminating sequence. Cause of error: {f}\
+                    \n"
+                )
+                raise AccessDenied(f"{self.base_url} answered {f.response.status_code}") from f
+            log_msg(
+                f"\n[sciscraper]: {self.base_url} answered {f.response.status_code} while searching for {search_text}.\
+                \n[sciscraper]: Proceeding to next item in sequence.\
+                Cause of error: {f}\n"
+            )
+            return None
+        except RequestException as e:
+            METRICS.count("http_errors")
             print(
                 f"\n[sciscraper]: An error occurred while searching for {search_text}.\
                 \n[sciscraper]: Proceeding to next item in sequence.\
                 Cause of error: {e}\n"
             )
-            pass
-        except HTTPError as f:
-            print(
-                f"\n[sciscraper]: Access to {self.base_url} denied while searching for {search_text}.\
-                \n[sciscraper]: Terminating sequence. Cause of error: {f}\
-                \n"
-            )
-            quit()
+            return None
+
 
-        for item in self.docs:
-            self.data = {_key: item.get(_key, "") for _key in KEYS}
-        return self.data
+def build_json_scraper(
+    config: ScrapeConfig, client: Optional[HttpClient] = None
+) -> JSONScrape:
+    cache = (
+        ResponseCache(
+            config.response_cache_dir,
+            config.response_cache_max_bytes,
+            config.response_cache_ttl,
+        )
+        if config.response_cache_dir
+        else None
+    )
+    return JSONScrape(
+        base_url=config.url_dmnsns,
+        client=client or build_http_client(config),
+        cache=cache,
+        cache_only=config.cache_only,
+    )
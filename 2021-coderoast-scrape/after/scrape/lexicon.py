@@ -0,0 +1,82 @@
+import re
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+
+def normalize_term(term: str) -> str:
+    """Reduces a lexicon entry to lowercase words separated by single spaces, the same way pages are normalized."""
+    return " ".join(re.findall(r"\w+", term.lower()))
+
+
+def read_terms(word_file: str) -> set[str]:
+    """Reads one term per line, skipping blank lines."""
+    with open(word_file) as f:
+        return {term for term in map(normalize_term, f) if term}
+
+
+class LexiconMatcher:
+    """The LexiconMatcher class is an Aho-Corasick automaton over words rather than characters.
+    It finds every single-word and multi-word term of a lexicon in one pass over a normalized text,
+    so the cost of a match does not depend on how many terms the lexicon holds.
+    """
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail = [0]
+        self.output: list[str] = [""]
+        self.depth = [0]
+        for term in terms:
+            self.add(normalize_term(term))
+        self.link()
+
+    def add(self, term: str) -> None:
+        if not term:
+            return
+        state = 0
+        for word in term.split():
+            if word not in self.goto[state]:
+                self.goto[state][word] = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append("")
+                self.depth.append(self.depth[state] + 1)
+            state = self.goto[state][word]
+        self.output[state] = term
+
+    def link(self) -> None:
+        """Computes the failure links breadth-first, plus a shortcut to the next state that ends a term."""
+        self.next_output = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                suffix = self.fail[child]
+                self.next_output[child] = suffix if self.output[suffix] else self.next_output[suffix]
+                queue.append(child)
+
+    def find(self, text: str) -> Iterator[tuple[int, str]]:
+        """Yields (word position, term) for every occurrence of a term in the text."""
+        state = 0
+        for position, word in enumerate(text.split()):
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            match = state if self.output[state] else self.next_output[state]
+            while match:
+                yield position - self.depth[match] + 1, self.output[match]
+                match = self.next_output[match]
+
+    def count(self, text: str) -> Counter[str]:
+        """Counts how often each term occurs in the text."""
+        return Counter(term for _, term in self.find(text))
+
+
+@lru_cache(maxsize=None)
+def load_lexicon(*word_files: str) -> LexiconMatcher:
+    """Compiles the terms of the word files into one matcher, once per process."""
+    return LexiconMatcher(set().union(*map(read_terms, word_files)))
@@ -0,0 +1,59 @@
+import codecs
+from html.parser import HTMLParser
+from typing import Iterable, Iterator
+
+from bs4 import BeautifulSoup
+
+LINK_PARSERS = ("stream", "soup")
+ONCLICK_PREFIX = "location.href="
+CHUNK_SIZE = 1 << 14
+
+
+def link_from_onclick(onclick: str) -> str:
+    return (onclick.split("=")[1]).strip("'")
+
+
+class ButtonLinkParser(HTMLParser):
+    """The ButtonLinkParser class collects the targets of buttons whose onclick sets location.href.
+    It is fed the page a chunk at a time and only looks at start tags, so no document tree is built.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.links: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str]]) -> None:
+        if tag != "button":
+            return
+        for name, value in attrs:
+            if name == "onclick":
+                # Only the first onclick counts, as in a parsed document.
+                if value and value.startswith(ONCLICK_PREFIX):
+                    self.links.append(link_from_onclick(value))
+                return
+
+
+def extract_links(chunks: Iterable[str]) -> list[str]:
+    """Returns the button links of a page given as chunks of text, in the order they appear."""
+    parser = ButtonLinkParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser.links
+
+
+def extract_links_with_soup(html: str) -> list[str]:
+    """Returns the same links as extract_links, by parsing the whole page with BeautifulSoup."""
+    soup = BeautifulSoup(html, "lxml")
+    return list(
+        link_from_onclick(item["onclick"])
+        for item in soup.select("button[onclick^='location.href=']")
+    )
+
+
+def iter_text(response, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Decodes a streamed response as it arrives, in the encoding requests would use for response.text."""
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    for chunk in response.iter_content(chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
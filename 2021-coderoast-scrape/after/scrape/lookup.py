@@ -0,0 +1,117 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Sequence
+
+from tqdm import tqdm
+
+from scrape.http import AccessDenied
+from scrape.json import JSONScrape
+from scrape.log import log_msg
+from scrape.scraper import ScrapeResult
+
+Batch = list[tuple[int, str]]
+
+
+def batch_searches(
+    scraper: JSONScrape, search_terms: Sequence[str], batch_size: int
+) -> Iterator[Batch]:
+    """Groups the searches that have to go out to the website into batches of up to batch_size,
+    keeping DOIs and publication IDs apart since they are searched in different fields.
+    Searches the response cache can answer are left on their own.
+    """
+    pending: dict[str, Batch] = {}
+    for index, search_text in enumerate(search_terms):
+        if batch_size < 2 or not scraper.needs_request(search_text):
+            yield [(index, search_text)]
+            continue
+        search_field = scraper.querystring(search_text)["search_field"]
+        batch = pending.setdefault(search_field, [])
+        batch.append((index, search_text))
+        if len(batch) == batch_size:
+            yield pending.pop(search_field)
+    yield from pending.values()
+
+
+async def _search_one(
+    scraper: JSONScrape, search_text: str, pool: ThreadPoolExecutor
+) -> Optional[ScrapeResult]:
+    if scraper.needs_request(search_text):
+        await scraper.limiter.acquire()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            pool, scraper.search, search_text
+        )
+    except AccessDenied:
+        raise
+    except Exception as e:
+        log_msg(f"\n[sciscraper]: Skipping {search_text}. Cause of error: {e}\n")
+        return None
+
+
+async def _search_worker(
+    scraper: JSONScrape,
+    queue: Iterator[Batch],
+    results: list[Optional[ScrapeResult]],
+    pool: ThreadPoolExecutor,
+    progress: tqdm,
+) -> None:
+    """Takes batches off the shared queue until it runs dry.
+    Each search that has to go out to the website waits on the scraper's limiter,
+    then runs on the thread pool, since requests blocks.
+    Identifiers a batched search did not find are looked up on their own.
+    """
+    for batch in queue:
+        if len(batch) == 1:
+            index, search_text = batch[0]
+            results[index] = await _search_one(scraper, search_text, pool)
+            progress.update()
+            continue
+        await scraper.limiter.acquire()
+        try:
+            found = await asyncio.get_running_loop().run_in_executor(
+                pool, scraper.search_batch, [search_text for _, search_text in batch]
+            )
+        except AccessDenied:
+            raise
+        except Exception as e:
+            log_msg(f"\n[sciscraper]: A batched search failed. Cause of error: {e}\n")
+            found = [None] * len(batch)
+        for (index, search_text), result in zip(batch, found):
+            if result is None:
+                result = await _search_one(scraper, search_text, pool)
+            results[index] = result
+            progress.update()
+
+
+async def search_concurrently(
+    scraper: JSONScrape,
+    search_terms: Sequence[str],
+    concurrency: int,
+    batch_size: int = 1,
+) -> list[Optional[ScrapeResult]]:
+    """Runs the searches with at most concurrency of them in flight, within the limiter's rate,
+    packing up to batch_size identifiers into each request.
+    The results line up with search_terms, with None for the searches that failed.
+    AccessDenied stops every search, since the ones still queued would be refused too.
+    """
+    results: list[Optional[ScrapeResult]] = [None] * len(search_terms)
+    queue = batch_searches(scraper, search_terms, batch_size)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool, tqdm(
+        total=len(search_terms)
+    ) as progress:
+        await asyncio.gather(
+            *(
+                _search_worker(scraper, queue, results, pool, progress)
+                for _ in range(concurrency)
+            )
+        )
+    return results
+
+
+def search_all(
+    scraper: JSONScrape,
+    search_terms: Sequence[str],
+    concurrency: int = 1,
+    batch_size: int = 1,
+) -> list[Optional[ScrapeResult]]:
+    return asyncio.run(search_concurrently(scraper, search_terms, concurrency, batch_size))
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import pdfplumber
+
+from scrape.archive import PdfSource
+from scrape.cache import file_digest
+from scrape.config import ScrapeConfig
+from scrape.log import log_msg
+from scrape.pdf import EXTRACT_PARAMS
+from scrape.scraper import ScrapeResult
+
+
+def result_to_json(result: ScrapeResult) -> dict:
+    return asdict(result)
+
+
+def result_from_json(data: dict) -> ScrapeResult:
+    """Rebuilds a ScrapeResult, turning the JSON lists back into (word, count) tuples."""
+    return ScrapeResult(
+        **{
+            **data,
+            "frequency": [tuple(pair) for pair in data["frequency"]],
+            "study_design": [tuple(pair) for pair in data["study_design"]],
+        }
+    )
+
+
+def scoring_fingerprint(config: ScrapeConfig) -> str:
+    """Returns a hash of everything a recorded result depends on besides the file itself:
+    the content of the three word lists, the tokenizer, the document byte limit, the triage settings,
+    and the text extraction settings and pdfplumber version that the page cache is keyed on as well.
+    """
+    settings = {
+        "research_words": file_digest(config.research_words),
+        "bycatch_words": file_digest(config.bycatch_words),
+        "target_words": file_digest(config.target_words),
+        "tokenizer": config.tokenizer,
+        "max_document_bytes": config.max_document_bytes,
+        "triage_pages": config.triage_pages,
+        "triage_accept": config.triage_accept,
+        "triage_reject": config.triage_reject,
+        "extract": {**EXTRACT_PARAMS, "pdfplumber": pdfplumber.__version__},
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    size: int
+    mtime: float
+    digest: str
+    result: dict
+
+
+class Manifest:
+    """The Manifest class remembers the size, mtime, content hash and scrape result of every file in a corpus.
+    It is used to scrape only the files that were added or changed since the last run.
+    The results are only reused while the fingerprint of the scoring settings they were recorded with still matches;
+    otherwise the manifest starts over and every file is scraped again.
+    """
+
+    def __init__(self, manifest_file: str, fingerprint: str = "") -> None:
+        self.manifest_file = manifest_file
+        self.fingerprint = fingerprint
+        self.entries: dict[str, ManifestEntry] = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file) as file:
+                data = json.load(file)
+            if data.get("fingerprint") == fingerprint and "entries" in data:
+                self.entries = {
+                    path_name: ManifestEntry(**entry)
+                    for path_name, entry in data["entries"].items()
+                }
+            else:
+                log_msg(
+                    f"\n[sciscraper]: The scoring settings changed since {manifest_file} was saved,"
+                    " so every file will be scraped again.\n"
+                )
+
+    def is_current(self, source: PdfSource) -> bool:
+        """Checks whether the file is unchanged since its entry was recorded.
+        The content is only hashed when the size or mtime differ.
+        """
+        entry = self.entries.get(source.name)
+        if entry is None:
+            return False
+        if source.size == entry.size and source.mtime == entry.mtime:
+            return True
+        if source.size == entry.size and source.digest() == entry.digest:
+            entry.mtime = source.mtime
+            return True
+        return False
+
+    def record(self, source: PdfSource, result: ScrapeResult) -> None:
+        self.entries[source.name] = ManifestEntry(
+            size=source.size,
+            mtime=source.mtime,
+            digest=source.digest(),
+            result=result_to_json(result),
+        )
+
+    def result(self, path_name: str) -> Optional[ScrapeResult]:
+        entry = self.entries.get(path_name)
+        return result_from_json(entry.result) if entry else None
+
+    def prune(self, path_names: list[str]) -> int:
+        """Drops the entries of files that are no longer in the corpus and returns how many were dropped."""
+        keep = set(path_names)
+        deleted = [path_name for path_name in self.entries if path_name not in keep]
+        for path_name in deleted:
+            del self.entries[path_name]
+        return len(deleted)
+
+    def save(self) -> None:
+        temp_name = f"{self.manifest_file}.tmp"
+        with open(temp_name, "w") as file:
+            json.dump(
+                {
+                    "fingerprint": self.fingerprint,
+                    "entries": {path_name: asdict(entry) for path_name, entry in self.entries.items()},
+                },
+                file,
+            )
+        os.replace(temp_name, self.manifest_file)
@@ -0,0 +1,87 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+@dataclass
+class DocumentTermMatrix:
+    """Token counts for a whole corpus: one row per document, one column per token id.
+    Only the non-zero counts are stored.
+    """
+
+    counts: csr_matrix
+    token_ids: dict[str, int]
+
+    def __post_init__(self) -> None:
+        self.vocabulary = list(self.token_ids)
+
+    def columns(self, words: set[str]) -> np.ndarray:
+        """Returns the sorted token ids of the words that occur anywhere in the corpus."""
+        ids = self.token_ids
+        return np.array(sorted(ids[word] for word in words if word in ids), dtype=np.int64)
+
+    def count_present(self, columns: np.ndarray) -> np.ndarray:
+        """Counts, for every document, how many of the given columns it contains."""
+        if len(columns) == 0:
+            return np.zeros(self.counts.shape[0], dtype=np.int64)
+        return np.asarray((self.counts[:, columns] > 0).sum(axis=1)).ravel()
+
+    def top_terms(
+        self, n: int, columns: Optional[np.ndarray] = None
+    ) -> list[list[tuple[str, int]]]:
+        """Returns the n most frequent terms of every document, optionally restricted to some columns.
+        Ties are broken by token id, which is the order in which the corpus first used each term.
+        """
+        counts = self.counts if columns is None else self.counts[:, columns]
+        counts = counts.tocsr()
+        counts.sort_indices()
+        terms = np.arange(self.counts.shape[1]) if columns is None else columns
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        order = np.lexsort((counts.indices, -counts.data, rows))
+        rank = np.arange(len(order)) - counts.indptr[rows[order]]
+        keep = order[rank < n]
+        bounds = np.searchsorted(rows[keep], np.arange(counts.shape[0] + 1))
+        words = [self.vocabulary[term] for term in terms[counts.indices[keep]]]
+        values = counts.data[keep].tolist()
+        return [
+            list(zip(words[start:stop], values[start:stop]))
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+
+
+class DocumentTermMatrixBuilder:
+    """The DocumentTermMatrixBuilder class turns per-document token counts into matrix rows, one document at a time.
+    Token ids are shared across the corpus, so each document only costs its distinct tokens.
+    """
+
+    def __init__(self) -> None:
+        self.vocabulary: dict[str, int] = {}
+        self.indices: list[np.ndarray] = []
+        self.data: list[np.ndarray] = []
+        self.indptr = [0]
+
+    def add(self, counts: Counter) -> int:
+        """Appends a document and returns its row number."""
+        ids = np.fromiter(
+            (self.vocabulary.setdefault(word, len(self.vocabulary)) for word in counts),
+            dtype=np.int64,
+            count=len(counts),
+        )
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        order = np.argsort(ids)
+        self.indices.append(ids[order])
+        self.data.append(values[order])
+        self.indptr.append(self.indptr[-1] + len(counts))
+        return len(self.indptr) - 2
+
+    def build(self) -> DocumentTermMatrix:
+        shape = (len(self.indptr) - 1, len(self.vocabulary))
+        indices = np.concatenate(self.indices) if self.indices else np.zeros(0, np.int64)
+        data = np.concatenate(self.data) if self.data else np.zeros(0, np.int64)
+        return DocumentTermMatrix(
+            counts=csr_matrix((data, indices, np.array(self.indptr)), shape=shape),
+            token_ids=self.vocabulary,
+        )
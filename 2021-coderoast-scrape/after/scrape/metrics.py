@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+_DONE: Any = object()
+
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+@dataclass
+class StageStats:
+    wall: float = 0.0
+    cpu: float = 0.0
+    calls: int = 0
+
+
+@dataclass
+class Histogram:
+    """Counts observations into cumulative-style buckets; the last count is for values above every bound."""
+
+    bounds: list[float] = field(default_factory=lambda: list(LATENCY_BUCKETS))
+    counts: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+
+class Metrics:
+    """The Metrics class collects per-stage wall and CPU time, counters and latency histograms for one process.
+    Worker processes send a snapshot of theirs back with each result, which the parent merges in,
+    and the parent writes the run report at the end.
+    """
+
+    def __init__(self) -> None:
+        # Threads fetching and writing at once update the same counters.
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.stages: dict[str, StageStats] = {}
+        self.counters: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.gauges: dict[str, dict[str, float]] = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, histogram: Optional[str] = None) -> Iterator[None]:
+        """Adds the time spent in the block to the named stage, and to the named histogram if one is given,
+        whether the block finishes or raises."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - wall
+            with self.lock:
+                stats = self.stages.setdefault(name, StageStats())
+                stats.wall += elapsed
+                stats.cpu += time.process_time() - cpu
+                stats.calls += 1
+                if histogram is not None:
+                    self.histograms.setdefault(histogram, Histogram()).observe(elapsed)
+
+    def timed(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Yields from iterable, adding the time spent producing each item to the named stage.
+        Closing the generator closes the wrapped iterator too.
+        """
+        iterator = iter(iterable)
+        try:
+            while True:
+                with self.stage(name):
+                    item = next(iterator, _DONE)
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def record_response(self, response: Any) -> None:
+        """Counts an HTTP request, along with any retries urllib3 made along the way,
+        or as failed if it raised instead of coming back with a response."""
+        self.count("http_requests")
+        if response is None:
+            self.count("http_request_failures")
+            return
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        if retries is not None:
+            self.count("http_retries", len(retries.history))
+
+    def count(self, name: str, amount: float = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name: str, value: float, **labels: str) -> None:
+        """Sets the current value of a gauge, one value for each combination of labels."""
+        label = ",".join(f'{key}="{text}"' for key, text in sorted(labels.items()))
+        with self.lock:
+            self.gauges.setdefault(name, {})[label] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self.lock:
+            self.histograms.setdefault(name, Histogram()).observe(value)
+
+    def snapshot(self) -> dict:
+        return {
+            "stages": {name: asdict(stats) for name, stats in self.stages.items()},
+            "counters": dict(self.counters),
+            "histograms": {name: asdict(h) for name, h in self.histograms.items()},
+            "gauges": {name: dict(values) for name, values in self.gauges.items()},
+        }
+
+    def merge(self, snapshot: dict) -> None:
+        for name, stats in snapshot["stages"].items():
+            merged = self.stages.setdefault(name, StageStats())
+            merged.wall += stats["wall"]
+            merged.cpu += stats["cpu"]
+            merged.calls += stats["calls"]
+        for name, amount in snapshot["counters"].items():
+            self.count(name, amount)
+        for name, histogram in snapshot["histograms"].items():
+            merged = self.histograms.setdefault(name, Histogram())
+            merged.counts = [a + b for a, b in zip(merged.counts, histogram["counts"])]
+            merged.total += histogram["total"]
+        for name, values in snapshot["gauges"].items():
+            self.gauges.setdefault(name, {}).update(values)
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "elapsed": elapsed,
+            "documents_per_second": self.counters.get("documents", 0) / elapsed,
+            "pages_per_second": self.counters.get("pages", 0) / elapsed,
+            **self.snapshot(),
+        }
+
+    def write_report(self, report_file: str) -> None:
+        with open(report_file, "w") as f:
+            json.dump(self.report(), f, indent=4)
+
+    def write_prometheus(self, textfile: str) -> None:
+        """Writes the metrics in the Prometheus text format, renaming the file into place for the node exporter."""
+        lines = [
+            "# TYPE sciscraper_stage_wall_seconds counter",
+            *(
+                f'sciscraper_stage_wall_seconds{{stage="{name}"}} {stats.wall}'
+                for name, stats in self.stages.items()
+            ),
+            "# TYPE sciscraper_stage_cpu_seconds counter",
+            *(
+                f'sciscraper_stage_cpu_seconds{{stage="{name}"}} {stats.cpu}'
+                for name, stats in self.stages.items()
+            ),
+        ]
+        for name, amount in self.counters.items():
+            lines += [f"# TYPE sciscraper_{name}_total counter", f"sciscraper_{name}_total {amount}"]
+        for name, values in self.gauges.items():
+            lines.append(f"# TYPE sciscraper_{name} gauge")
+            lines += [
+                f"sciscraper_{name}{{{label}}} {value}" if label else f"sciscraper_{name} {value}"
+                for label, value in values.items()
+            ]
+        for name, histogram in self.histograms.items():
+            lines.append(f"# TYPE sciscraper_{name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f'sciscraper_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [
+                f"sciscraper_{name}_sum {histogram.total}",
+                f"sciscraper_{name}_count {cumulative}",
+            ]
+        temp_name = f"{textfile}.tmp"
+        with open(temp_name, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_name, textfile)
+
+
+METRICS = Metrics()
@@ -0,0 +1,118 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Optional
+
+from scrape.cache import file_digest
+from scrape.config import ScrapeConfig
+from scrape.log import log_msg
+from scrape.metrics import METRICS
+
+# Downloaded papers are named {date}_{doi without slashes}.pdf.
+PAPER_NAME = re.compile(r"^\d{6}_.+\.pdf$")
+
+
+def normalize_doi(doi: str) -> str:
+    """Returns the DOI lowercased, since DOIs are not case sensitive, with its slashes kept,
+    since without them two DOIs can read the same, as 10.1000/1234 and 10.10001/234 do."""
+    return doi.strip().lower()
+
+
+class DownloadIndex:
+    """The DownloadIndex class remembers which papers are in research_dir, by DOI and by content hash, in SQLite.
+    A paper that was downloaded through it is not searched for or downloaded again, whatever date it was downloaded on,
+    and nor is one whose download is still pending.
+    A download that turns out to be byte for byte the same as a paper already there is deleted,
+    and its DOI points to the copy that was there first, so the corpus only holds each paper once.
+    It is shared by the download threads, so every statement is run under a lock.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.pending: set[str] = set()
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS papers (doi TEXT PRIMARY KEY, path TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS contents (digest TEXT PRIMARY KEY, path TEXT NOT NULL);
+            """
+        )
+
+    def lookup(self, doi: str) -> Optional[str]:
+        """Returns the path of the paper with this DOI, or None if it has not been downloaded or has since been deleted."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT path FROM papers WHERE doi = ?", (normalize_doi(doi),)
+            ).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return row[0]
+
+    def is_pending(self, doi: str) -> bool:
+        with self.lock:
+            return normalize_doi(doi) in self.pending
+
+    def mark_pending(self, doi: str) -> None:
+        """Records that the paper with this DOI has been queued for download."""
+        with self.lock:
+            self.pending.add(normalize_doi(doi))
+
+    def discard_pending(self, doi: str) -> None:
+        """Forgets a queued download that failed, so the paper is searched for again."""
+        with self.lock:
+            self.pending.discard(normalize_doi(doi))
+
+    def add(self, doi: str, path_name: str) -> str:
+        """Records a downloaded paper and returns its path, or that of the identical paper it was collapsed into."""
+        path_name = self.add_content(path_name)
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO papers (doi, path) VALUES (?, ?)", (normalize_doi(doi), path_name)
+            )
+            self.db.commit()
+            self.pending.discard(normalize_doi(doi))
+        return path_name
+
+    def add_content(self, path_name: str) -> str:
+        """Records a paper's content hash and returns its path, or that of the identical paper it was collapsed into."""
+        digest = file_digest(path_name)
+        with self.lock:
+            row = self.db.execute("SELECT path FROM contents WHERE digest = ?", (digest,)).fetchone()
+            if row is not None and row[0] != path_name and os.path.exists(row[0]):
+                os.remove(path_name)
+                METRICS.count("duplicates_collapsed")
+                log_msg(
+                    f"\n[sciscraper]: {path_name} is the same paper as {row[0]}, so it was removed.\n"
+                )
+                path_name = row[0]
+            else:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO contents (digest, path) VALUES (?, ?)", (digest, path_name)
+                )
+                self.db.commit()
+        return path_name
+
+    def scan(self, research_dir: str) -> None:
+        """Hashes the papers in research_dir that were put there without going through the index,
+        collapsing any that are identical, so that a later download of the same paper is collapsed into them.
+        Their DOIs cannot be read back from their names, so they are not looked up by DOI.
+        Papers that are already indexed are not hashed again.
+        """
+        if not os.path.isdir(research_dir):
+            return
+        with self.lock:
+            known = {path_name for (path_name,) in self.db.execute("SELECT path FROM contents")}
+        for name in sorted(os.listdir(research_dir)):
+            path_name = os.path.join(research_dir, name)
+            if PAPER_NAME.match(name) and path_name not in known:
+                self.add_content(path_name)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def build_download_index(config: ScrapeConfig) -> DownloadIndex:
+    index = DownloadIndex(config.download_index)
+    index.scan(config.research_dir)
+    return index
@@ -0,0 +1,170 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Sized
+
+from tqdm import tqdm
+
+from scrape.archive import PdfSource
+from scrape.config import ScrapeConfig
+from scrape.log import log_msg
+from scrape.matrix import DocumentTermMatrixBuilder
+from scrape.metrics import METRICS
+from scrape.pdf import DocumentCounts, PDFScrape, build_pdf_scraper
+from scrape.scraper import ScrapeResult
+from scrape.watchdog import Supervisor
+
+# Each worker process builds its own scraper once, in the pool initializer.
+_scraper: Optional[PDFScrape] = None
+
+
+def count_safely(scraper: PDFScrape, source: PdfSource) -> Optional[DocumentCounts]:
+    """Counts the words of a single file, logging and skipping it if the scrape fails."""
+    try:
+        with source.content() as data:
+            return scraper.count_words(source.name, data)
+    except Exception as e:
+        METRICS.count("documents_failed")
+        log_msg(f"\n[sciscraper]: Skipping {source.name}. Cause of error: {e}\n")
+        return None
+
+
+def _init_worker(config: ScrapeConfig) -> None:
+    global _scraper
+    _scraper = build_pdf_scraper(config)
+
+
+def _count_in_worker(source: PdfSource) -> tuple[Optional[DocumentCounts], dict]:
+    """Counts one file, sending back the metrics it recorded for the parent to merge."""
+    METRICS.reset()
+    counts = count_safely(_scraper, source)
+    return counts, METRICS.snapshot()
+
+
+def count_pdf_files(
+    sources: Iterable[PdfSource], config: ScrapeConfig, scraper: PDFScrape
+) -> Iterator[tuple[int, Optional[DocumentCounts]]]:
+    """Yields the word counts of each file in order, with None for the ones that failed.
+    With more than one worker, the files are fanned out to a pool of config.workers processes.
+    Only a few files per worker are in flight at once, and results that complete early
+    are held back until their turn. If a worker dies outright, the files in flight are skipped
+    and a fresh pool takes over the rest.
+    With a per-document time or memory limit, the files go through a watchdog Supervisor instead.
+    """
+    if config.doc_timeout or config.doc_max_memory:
+        yield from Supervisor(config).run(sources)
+        return
+    if config.workers < 2:
+        for index, source in enumerate(tqdm(sources)):
+            yield index, count_safely(scraper, source)
+        return
+    queue = enumerate(sources)
+    total = len(sources) if isinstance(sources, Sized) else None
+    pool = _start_pool(config)
+    try:
+        with tqdm(total=total) as progress:
+            futures: dict[Future, tuple[int, str]] = {}
+            pending: dict[int, Optional[DocumentCounts]] = {}
+            next_index = 0
+            while True:
+                for index, source in islice(queue, config.workers * 2 - len(futures)):
+                    futures[pool.submit(_count_in_worker, source)] = index, source.name
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    try:
+                        counts, snapshot = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        continue
+                    METRICS.merge(snapshot)
+                    pending[futures.pop(future)[0]] = counts
+                    progress.update()
+                if broken:
+                    # A worker died outright, so every file in flight is lost with the pool.
+                    for index, name in sorted(futures.values()):
+                        METRICS.count("documents_failed")
+                        log_msg(f"\n[sciscraper]: Skipping {name}, which was in flight when a worker died.\n")
+                        pending[index] = None
+                        progress.update()
+                    futures.clear()
+                    pool.shutdown(wait=True)
+                    pool = _start_pool(config)
+                while next_index in pending:
+                    yield next_index, pending.pop(next_index)
+                    next_index += 1
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _start_pool(config: ScrapeConfig) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=config.workers, initializer=_init_worker, initargs=(config,)
+    )
+
+
+def score_pdf_files(
+    scraper: PDFScrape, counts: list[Optional[DocumentCounts]]
+) -> list[Optional[ScrapeResult]]:
+    """Gathers the word and lexicon term counts of a run of files into matrices, then scores them all at once.
+    The results line up with counts, with None for the files that failed.
+    """
+    words, terms = DocumentTermMatrixBuilder(), DocumentTermMatrixBuilder()
+    rows: dict[int, int] = {}
+    documents: list[DocumentCounts] = []
+    for index, document in enumerate(counts):
+        if document is not None:
+            rows[index] = words.add(document.words)
+            terms.add(document.terms)
+            documents.append(document.summary())
+    with METRICS.stage("score"):
+        scores = scraper.score(documents, words.build(), terms.build())
+    results: list[Optional[ScrapeResult]] = [None] * len(counts)
+    for index, row in rows.items():
+        results[index] = scores[row]
+    return results
+
+
+def iter_scrape_pdf_files(
+    sources: Iterable[PdfSource], config: ScrapeConfig, window: Optional[int] = None
+) -> Iterator[Optional[ScrapeResult]]:
+    """Yields the result of each file in order, with None for the ones that failed.
+    The files are scored window files at a time, so only one window's counts are held in memory.
+    Every score only depends on its own file, but ties between equally frequent terms go to the term
+    its window used first, so the order of tied top terms can depend on the window.
+    Without a window, the whole corpus is scored at once.
+    """
+    scraper = build_pdf_scraper(config)
+    pending: list[Optional[DocumentCounts]] = []
+    scored = early = pages_skipped = 0
+    try:
+        for _, counts in count_pdf_files(sources, config, scraper):
+            pending.append(counts)
+            if counts is not None:
+                scored += 1
+                if counts.decided_early:
+                    early += 1
+                    pages_skipped += counts.pages_skipped
+            if window and len(pending) == window:
+                yield from score_pdf_files(scraper, pending)
+                pending = []
+        if pending:
+            yield from score_pdf_files(scraper, pending)
+    finally:
+        scraper.close()
+    if config.triage_pages:
+        log_msg(
+            f"\n[sciscraper]: Triage decided {early} of {scored} papers early,"
+            f" skipping {pages_skipped} pages.\n"
+        )
+
+
+def scrape_pdf_files(
+    sources: Iterable[PdfSource], config: ScrapeConfig
+) -> list[Optional[ScrapeResult]]:
+    """Counts the words and lexicon terms of every file into corpus-wide matrices, then scores them all at once.
+    The results line up with the sources, with None for the ones that failed.
+    """
+    return list(iter_scrape_pdf_files(sources, config))
@@ -1,11 +1,43 @@
+import os
 import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, closing, nullcontext
+from dataclasses import dataclass, replace
 from os import path
+from typing import BinaryIO, Iterator, Optional
 
 import pdfplumber
-from nltk import FreqDist
-from nltk.corpus import names, stopwords
-from nltk.tokenize import word_tokenize
+from pdfplumber.pdf import PDF
+from scrape.cache import PageCache, file_digest, stream_digest
+from scrape.config import ScrapeConfig
+from scrape.lexicon import load_lexicon, read_terms
+from scrape.log import log_msg
+from scrape.matrix import DocumentTermMatrix, DocumentTermMatrixBuilder
+from scrape.metrics import METRICS
 from scrape.scraper import ScrapeResult
+from scrape.tokens import TOKENIZERS, stop_words
+
+EXTRACT_PARAMS = {"x_tolerance": 3, "y_tolerance": 3}
+
+
+@dataclass
+class DocumentCounts:
+    """How often each token, and each lexicon term, occurs in a document.
+    In triage mode, it also records whether the document was decided from its front matter
+    and how many pages that saved.
+    """
+
+    doi: str
+    words: Counter[str]
+    terms: Counter[str]
+    decided_early: bool = False
+    pages_skipped: int = 0
+
+    def summary(self) -> "DocumentCounts":
+        """Returns a copy without the counts, once they have gone into the corpus matrices."""
+        return replace(self, words=Counter(), terms=Counter())
 
 
 def guess_doi(path_name: str) -> str:
@@ -15,20 +47,56 @@ def guess_doi(path_name: str) -> str:
     return f"{doi[:7]}/{doi[7:]}"
 
 
-def compute_filtered_tokens(text: list[str]) -> set[str]:
+def count_filtered_tokens(text: list[str], engine: str = "nltk") -> Counter[str]:
+    """Takes a lowercase string, now removed of its non-alphanumeric characters.
+    It returns how often each token of the postprint occurs, with stopwords removed.
+    Names are kept: the original filter meant to drop them never removed any, so scores stay as they were.
+    The engine names one of the tokenizers in scrape.tokens.TOKENIZERS.
+    """
+    word_tokens = TOKENIZERS[engine]("\n".join(text))
+    stop = stop_words()
+    return Counter(w for w in word_tokens if w not in stop)
+
+
+def compute_filtered_tokens(text: list[str], engine: str = "nltk") -> set[str]:
     """Takes a lowercase string, now removed of its non-alphanumeric characters.
-    It returns (as a list comprehension) a parsed and tokenized
-    version of the postprint, with stopwords and names removed.
+    It returns (as a set) a parsed and tokenized
+    version of the postprint, with stopwords removed.
     """
-    stop_words = set(stopwords.words("english"))
-    name_words = set(names.words())
-    word_tokens = word_tokenize("\n".join(text))
-    return {w for w in word_tokens if w not in stop_words and name_words}
+    return set(count_filtered_tokens(text, engine))
+
+
+def open_pdf(search_text: str, data: Optional[BinaryIO] = None, **kwargs) -> PDF:
+    """Opens a PDF from its path, or from a file holding its content when it is an archive member."""
+    if data is None:
+        return pdfplumber.open(search_text, **kwargs)
+    data.seek(0)
+    return pdfplumber.open(data, **kwargs)
+
+
+def content_size(search_text: str, data: Optional[BinaryIO] = None) -> int:
+    if data is None:
+        return path.getsize(search_text)
+    return data.seek(0, os.SEEK_END)
 
 
-def most_common_words(word_set: set[str], n: int) -> list[tuple[str, int]]:
-    """Takes a set of words and returns a list of tuples of the most common words and their frequencies."""
-    return FreqDist(word_set).most_common(n)
+def extract_page_range(search_text: str, start: int, stop: int) -> list[str]:
+    """Opens the PDF on its own and returns the text of pages start to stop (exclusive)."""
+    preprints = []
+    with open_pdf(search_text, pages=range(start + 1, stop + 1)) as study:
+        for page in study.pages:
+            preprints.append(page.extract_text(**EXTRACT_PARAMS))
+            page.close()
+    return preprints
+
+
+def normalize_page(preprint: Optional[str]) -> str:
+    """Lowercases a page and reduces it to its words, separated by single spaces."""
+    manuscript = str(preprint).strip().lower()
+    # The preprint is stripped of extraneous characters and made lower case.
+    postprint = re.sub(r"\W+", " ", manuscript)
+    # The ensuing manuscript is stripped of lingering whitespace and non-alphanumeric characters.
+    return postprint
 
 
 class PDFScrape:
@@ -38,49 +106,234 @@ class PDFScrape:
     """
 
     def __init__(
-        self, research_words: str, bycatch_words: str, target_words: str
+        self,
+        research_words: str,
+        bycatch_words: str,
+        target_words: str,
+        cache: Optional[PageCache] = None,
+        max_document_bytes: Optional[int] = None,
+        tokenizer: str = "fast",
+        page_workers: int = 1,
+        page_parallel_threshold: int = 200,
+        triage_pages: int = 0,
+        triage_accept: int = 3,
+        triage_reject: int = -2,
     ) -> None:
-        with open(research_words) as f:
-            self.research_words = set(f.readlines())
-        with open(bycatch_words) as f:
-            self.bycatch_words = set(f.readlines())
-        with open(target_words) as f:
-            self.target_words = set(f.readlines())
+        self.cache = cache
+        self.max_document_bytes = max_document_bytes
+        self.tokenizer = tokenizer
+        self.page_workers = page_workers
+        # Started on the first document long enough to need it, and reused for the rest until close.
+        self.page_pool: Optional[ProcessPoolExecutor] = None
+        self.page_parallel_threshold = page_parallel_threshold
+        self.triage_pages = triage_pages
+        self.triage_accept = triage_accept
+        self.triage_reject = triage_reject
+        self.research_words = read_terms(research_words)
+        self.bycatch_words = read_terms(bycatch_words)
+        self.target_words = read_terms(target_words)
+        self.lexicon = load_lexicon(research_words, bycatch_words, target_words)
 
-    def scrape(self, search_text: str) -> ScrapeResult:
-        preprints = []
-        with pdfplumber.open(search_text) as study:
+    def extract_pages(
+        self, search_text: str, data: Optional[BinaryIO] = None, study: Optional[PDF] = None
+    ) -> Iterator[str]:
+        """Yields the text of each page, from the page cache when the file has been seen before.
+        A document that the caller already opened is passed as study, and read rather than opened again.
+        """
+        if self.cache is None:
+            return self.extract_pages_from_pdf(search_text, data, study)
+        content_digest = file_digest(search_text) if data is None else stream_digest(data)
+        key = PageCache.key(
+            content_digest, {**EXTRACT_PARAMS, "pdfplumber": pdfplumber.__version__}
+        )
+        preprints = self.cache.load(key)
+        METRICS.count("page_cache_misses" if preprints is None else "page_cache_hits")
+        if preprints is None:
+            preprints = self.cache.record(
+                key, self.extract_pages_from_pdf(search_text, data, study)
+            )
+        return preprints
+
+    def extract_pages_from_pdf(
+        self, search_text: str, data: Optional[BinaryIO] = None, study: Optional[PDF] = None
+    ) -> Iterator[str]:
+        """Yields the text of each page as soon as it is extracted.
+        The page's parsed layout objects and text map are released before moving on to the next one.
+        Documents of at least page_parallel_threshold pages are handed to extract_pages_in_chunks,
+        unless they are archive members, which the chunk workers cannot open by path.
+        In triage mode, the first triage_pages pages are still read here, so the chunks for the rest
+        are only started once the caller asks for more than triage needed.
+        An open study is left open for its caller to close.
+        """
+        with nullcontext(study) if study is not None else open_pdf(search_text, data) as study:
             n = len(study.pages)
-            pages_to_check = list(study.pages)[:n]
-            for page_number, page in enumerate(pages_to_check):
-                page = study.pages[page_number].extract_text(
-                    x_tolerance=3, y_tolerance=3
-                )
+            chunked = self.page_workers >= 2 and n >= self.page_parallel_threshold and data is None
+            front = min(self.triage_pages, n) if chunked else n
+            for page_number, page in enumerate(study.pages[:front]):
                 print(
                     f"[sciscraper]: Processing Page {page_number} of {n-1} | {search_text}...",
                     end="\r",
                 )
-                preprints.append(
-                    page
-                )  # Each page's string gets appended to preprint []
-
-            manuscripts = [str(preprint).strip().lower() for preprint in preprints]
-            # The preprints are stripped of extraneous characters and all made lower case.
-            postprints = [re.sub(r"\W+", " ", manuscript) for manuscript in manuscripts]
-            # The ensuing manuscripts are stripped of lingering whitespace and non-alphanumeric characters.
-            all_words = compute_filtered_tokens(postprints)
-
-            doi = guess_doi(search_text)
-            target_words = self.target_words.intersection(all_words)
-            bycatch_words = self.bycatch_words.intersection(all_words)
-            research_intersection = self.research_words.intersection(all_words)
-            word_score = len(target_words) - len(bycatch_words)
-            frequency = most_common_words(all_words, 5)
-            study_design = most_common_words(research_intersection, 3)
-
-            return ScrapeResult(
-                doi=doi,
+                preprint = page.extract_text(**EXTRACT_PARAMS)
+                page.close()
+                yield preprint
+        if front < n:
+            yield from self.extract_pages_in_chunks(search_text, n, front)
+
+    def extract_pages_in_chunks(self, search_text: str, n: int, start: int = 0) -> Iterator[str]:
+        """Splits pages start to n into chunks that are extracted concurrently by page_workers processes.
+        The chunks are yielded back in page order, each as soon as it and the ones before it are done.
+        The processes are kept for the next document rather than started again for each one.
+        """
+        if self.page_pool is None:
+            self.page_pool = ProcessPoolExecutor(max_workers=self.page_workers)
+        chunk_size = -(-(n - start) // (self.page_workers * 2))
+        chunks = [
+            self.page_pool.submit(
+                extract_page_range,
+                search_text,
+                chunk_start,
+                min(chunk_start + chunk_size, n),
+            )
+            for chunk_start in range(start, n, chunk_size)
+        ]
+        try:
+            for chunk_number, chunk in enumerate(chunks):
+                first = start + chunk_number * chunk_size
+                print(
+                    f"[sciscraper]: Processing Pages {first} to"
+                    f" {min(first + chunk_size, n) - 1} of {n-1} | {search_text}...",
+                    end="\r",
+                )
+                yield from chunk.result()
+        finally:
+            for chunk in chunks:
+                chunk.cancel()
+
+    def close(self) -> None:
+        """Stops the page extraction processes, if any were started."""
+        if self.page_pool is not None:
+            self.page_pool.shutdown(wait=True, cancel_futures=True)
+            self.page_pool = None
+
+    def read_front_matter(self, study: PDF) -> tuple[str, int]:
+        """Returns the title, subject and keywords embedded in the PDF, along with its page count."""
+        metadata = " ".join(
+            str(study.metadata[key])
+            for key in ("Title", "Subject", "Keywords")
+            if key in study.metadata
+        )
+        return metadata, len(study.pages)
+
+    def word_score(self, terms: Counter[str]) -> int:
+        """The number of target terms found, less the number of bycatch terms found."""
+        return len(self.target_words & terms.keys()) - len(self.bycatch_words & terms.keys())
+
+    def count_words(
+        self, search_text: str, data: Optional[BinaryIO] = None
+    ) -> DocumentCounts:
+        """Normalizes and tokenizes the document one page at a time, keeping only the token
+        and lexicon term counts. Pages past max_document_bytes of accumulated tokens are dropped.
+        That limit only covers the token strings kept for the document, as measured by sys.getsizeof,
+        not the memory of the process: the watchdog's doc_max_memory bounds that, by resident set size.
+        In triage mode, the embedded metadata and the first triage_pages pages are scored first,
+        and the rest of the document is only read if that score falls between the reject and accept bounds.
+        The metadata terms only go into the counts of a document decided early, so that a document
+        read in full is counted the same with or without triage. The document is opened once for both.
+        Archive members are read from data, a seekable file, rather than from search_text, which only names them.
+        """
+        counts = DocumentCounts(
+            doi=guess_doi(search_text), words=Counter(), terms=Counter()
+        )
+        METRICS.count("documents")
+        METRICS.count("bytes_read", content_size(search_text, data))
+        used_bytes = 0
+        with ExitStack() as stack:
+            study = None
+            if self.triage_pages:
+                study = stack.enter_context(open_pdf(search_text, data))
+                metadata, page_count = self.read_front_matter(study)
+                front_matter = self.lexicon.count(normalize_page(metadata))
+            preprints = METRICS.timed("extract", self.extract_pages(search_text, data, study))
+            stack.enter_context(closing(preprints))
+            for page_number, preprint in enumerate(preprints):
+                METRICS.count("pages")
+                with METRICS.stage("normalize"):
+                    postprint = normalize_page(preprint)
+                with METRICS.stage("tokenize"):
+                    page_words = count_filtered_tokens([postprint], self.tokenizer)
+                new_words = page_words.keys() - counts.words.keys()
+                used_bytes += sum(sys.getsizeof(word) for word in new_words)
+                if self.max_document_bytes and used_bytes > self.max_document_bytes:
+                    log_msg(
+                        f"\n[sciscraper]: {search_text} exceeded {self.max_document_bytes} bytes"
+                        f" of tokens; keeping the first {page_number} pages.\n"
+                    )
+                    break
+                counts.words.update(page_words)
+                with METRICS.stage("lexicon"):
+                    counts.terms.update(self.lexicon.count(postprint))
+                if page_number + 1 == self.triage_pages:
+                    word_score = self.word_score(counts.terms + front_matter)
+                    if not self.triage_reject < word_score < self.triage_accept:
+                        counts.terms.update(front_matter)
+                        counts.decided_early = True
+                        counts.pages_skipped = page_count - self.triage_pages
+                        break
+        return counts
+
+    def score(
+        self,
+        documents: list[DocumentCounts],
+        words: DocumentTermMatrix,
+        terms: DocumentTermMatrix,
+    ) -> list[ScrapeResult]:
+        """Scores every document of a corpus at once, from its token and lexicon term matrices."""
+        target_words = terms.count_present(terms.columns(self.target_words))
+        bycatch_words = terms.count_present(terms.columns(self.bycatch_words))
+        word_scores = (target_words - bycatch_words).tolist()
+        frequencies = words.top_terms(5)
+        study_designs = terms.top_terms(3, terms.columns(self.research_words))
+
+        return [
+            ScrapeResult(
+                doi=document.doi,
                 wordscore=word_score,
                 frequency=frequency,
                 study_design=study_design,
+                decided_early=document.decided_early,
+                pages_skipped=document.pages_skipped,
+            )
+            for document, word_score, frequency, study_design in zip(
+                documents, word_scores, frequencies, study_designs
             )
+        ]
+
+    def scrape(self, search_text: str) -> ScrapeResult:
+        words, terms = DocumentTermMatrixBuilder(), DocumentTermMatrixBuilder()
+        counts = self.count_words(search_text)
+        words.add(counts.words)
+        terms.add(counts.terms)
+        return self.score([counts], words.build(), terms.build())[0]
+
+
+def build_pdf_scraper(config: ScrapeConfig) -> PDFScrape:
+    cache = (
+        PageCache(config.cache_dir, config.cache_max_bytes)
+        if config.cache_dir
+        else None
+    )
+    return PDFScrape(
+        research_words=config.research_words,
+        bycatch_words=config.bycatch_words,
+        target_words=config.target_words,
+        cache=cache,
+        max_document_bytes=config.max_document_bytes,
+        tokenizer=config.tokenizer,
+        # The page processes of every worker share one budget, rather than each worker starting page_workers.
+        page_workers=max(1, config.page_workers // max(1, config.workers)),
+        page_parallel_threshold=config.page_parallel_threshold,
+        triage_pages=config.triage_pages,
+        triage_accept=config.triage_accept,
+        triage_reject=config.triage_reject,
+    )
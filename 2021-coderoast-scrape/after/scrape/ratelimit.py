@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+from scrape.log import log_msg
+from scrape.metrics import METRICS
+
+
+class RateLimiter:
+    """A token bucket shared by every request to one service.
+    Each caller reserves a token and is told how long to wait for it, so callers queue up
+    behind each other instead of all waking at once. It can be waited on from threads or coroutines.
+    While the limiter is paused, callers that already hold a token wait for the pause to end as well.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Takes a token, returning the number of seconds until it may be used."""
+        with self.lock:
+            self.refill(time.monotonic())
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Holds every caller back for the given number of seconds, and drops the tokens saved up until now."""
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            self.paused_until = max(self.paused_until, now + seconds)
+
+    def remaining_pause(self) -> float:
+        return self.paused_until - time.monotonic()
+
+    def wait(self) -> None:
+        time.sleep(self.reserve())
+        while (pause := self.remaining_pause()) > 0:
+            time.sleep(pause)
+
+    async def acquire(self) -> None:
+        await asyncio.sleep(self.reserve())
+        while (pause := self.remaining_pause()) > 0:
+            await asyncio.sleep(pause)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """A RateLimiter that finds the rate a service will put up with, by additive increase and
+    multiplicative decrease. Every healthy response raises the rate by a fixed step, up to max_rate.
+    Every throttled one cuts the rate by the decrease factor, down to min_rate,
+    and pauses all callers for as long as the service asked, or for one interval at the new rate.
+    The requests that were already in flight when the rate was cut are throttled for the same reason,
+    so the rate is cut at most once per interval at the rate it was cut to.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        min_rate: float = 0.1,
+        max_rate: float = 10.0,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+    ) -> None:
+        super().__init__(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.throttles = 0
+        self.decreased_at = float("-inf")
+
+    def set_rate(self, rate: float) -> None:
+        with self.lock:
+            self.refill(time.monotonic())
+            self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def on_success(self) -> None:
+        self.set_rate(self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float]) -> float:
+        """Slows down and pauses, returning the length of the pause."""
+        with self.lock:
+            self.throttles += 1
+            now = time.monotonic()
+            cut = now - self.decreased_at >= 1 / self.rate
+            if cut:
+                self.decreased_at = now
+        if cut:
+            self.set_rate(self.rate * self.decrease)
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        self.pause(pause)
+        return pause
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Reads a Retry-After header, which is either a number of seconds or an HTTP date."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateController:
+    """The RateController class keeps an AdaptiveRateLimiter for each host, created on first use.
+    Their current rates and throttle counts are published as metrics after every change.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 1,
+        min_rate: float = 0.1,
+        max_rate: float = 10.0,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+    ) -> None:
+        self.settings = dict(
+            rate=rate,
+            burst=burst,
+            min_rate=min_rate,
+            max_rate=max_rate,
+            increase=increase,
+            decrease=decrease,
+        )
+        self.limiters: dict[str, AdaptiveRateLimiter] = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, url: str) -> AdaptiveRateLimiter:
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.limiters:
+                self.limiters[host] = AdaptiveRateLimiter(**self.settings)
+            return self.limiters[host]
+
+    def on_success(self, url: str) -> None:
+        limiter = self.limiter(url)
+        limiter.on_success()
+        METRICS.gauge("request_rate", limiter.rate, host=urlparse(url).netloc)
+
+    def on_throttle(self, url: str, status: int, retry_after: Optional[float]) -> None:
+        host = urlparse(url).netloc
+        limiter = self.limiter(url)
+        pause = limiter.on_throttle(retry_after)
+        METRICS.count("throttle_events")
+        METRICS.gauge("request_rate", limiter.rate, host=host)
+        log_msg(
+            f"\n[sciscraper]: {host} answered {status}. Pausing for {pause:.1f} seconds,"
+            f" then resuming at {limiter.rate:.2f} requests per second.\n"
+        )
+
+    def rates(self) -> dict[str, float]:
+        with self.lock:
+            return {host: limiter.rate for host, limiter in self.limiters.items()}
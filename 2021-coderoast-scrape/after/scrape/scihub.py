@@ -1,64 +1,124 @@
 import logging
 import os
-import time
-from contextlib import suppress
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Optional
 
-import requests
-from bs4 import BeautifulSoup
+from requests.exceptions import HTTPError, RequestException
 
+from scrape.config import ScrapeConfig
+from scrape.download import Downloader, build_downloader
+from scrape.http import HttpClient, build_http_client
+from scrape.links import LINK_PARSERS, extract_links, extract_links_with_soup, iter_text
+from scrape.log import log_msg
+from scrape.metrics import METRICS
+from scrape.papers import DownloadIndex, build_download_index
 from scrape.scraper import ScrapeResult
 
 
 class SciHubScrape:
     """The SciHubScrape class takes the provided string from a prior list comprehension.
     Using that string value, it posts it to the selected website.
-    Then, it downloads the ensuing pdf file that appears as a result of that query.
+    Then, it queues the download of the ensuing pdf file that appears as a result of that query,
+    so the next search goes out while it downloads. Call close to wait for the downloads to finish.
+    With a download index, papers already downloaded, or queued for download, are skipped before any request is made,
+    and a download identical to a paper already there is collapsed into it.
+    The download links are picked out of the result page as it streams in, or, with the "soup" link parser,
+    from the whole page parsed by BeautifulSoup.
     """
 
+    def __init__(
+        self,
+        base_url: str,
+        research_dir: str,
+        client: Optional[HttpClient] = None,
+        downloader: Optional[Downloader] = None,
+        index: Optional[DownloadIndex] = None,
+        link_parser: str = "stream",
+    ) -> None:
+        if link_parser not in LINK_PARSERS:
+            raise ValueError(f"link_parser must be one of {LINK_PARSERS}, not {link_parser!r}")
+        self.base_url = base_url
+        self.research_dir = research_dir
+        self.client = client or HttpClient()
+        self.downloader = downloader or Downloader(self.client)
+        self.index = index
+        self.link_parser = link_parser
+
     def scrape(self, search_text: str) -> ScrapeResult:
-        """The download method generates a session and a payload that gets posted as a search query to the website.
+        """The download method generates a payload that gets posted as a search query to the website.
         This search should return a pdf.
-        Once the search is found, it is parsed with BeautifulSoup.
-        Then, the link to download that pdf is isolated.
+        Once the search is found, the link to download that pdf is isolated from the buttons on the page.
         """
-        self.sessions = requests.Session()
-        self.base_url = URL_SCIHUB
         print(
             f"[sciscraper]: Delving too greedily and too deep for download links for {search_text}, by means of dark and arcane magicx.",
             end="\r",
         )
+        if self.index is not None and (known := self.index.lookup(search_text)):
+            METRICS.count("downloads_skipped")
+            log_msg(f"\n[sciscraper]: {search_text} is already in {known}, so it was skipped.\n")
+            return
+        if self.index is not None and self.index.is_pending(search_text):
+            METRICS.count("downloads_skipped")
+            log_msg(f"\n[sciscraper]: {search_text} is already being downloaded, so it was skipped.\n")
+            return
         self.payload = {"request": f"{search_text}"}
-        with change_dir(RESEARCH_DIR):
-            time.sleep(1)
-            with suppress(
-                requests.exceptions.HTTPError, requests.exceptions.RequestException
-            ):
-                r = self.sessions.post(url=self.base_url, data=self.payload)
+        self.client.pace(self.base_url)
+        try:
+            with self.client.post(url=self.base_url, data=self.payload, stream=True) as r:
                 r.raise_for_status()
                 logging.info(r.status_code)
-                soup = BeautifulSoup(r.text, "lxml")
-                self.links = list(
-                    ((item["onclick"]).split("=")[1]).strip("'")
-                    for item in soup.select("button[onclick^='location.href=']")
-                )
-                self.enrich_scrape()
+                if self.link_parser == "soup":
+                    self.links = extract_links_with_soup(r.text)
+                else:
+                    self.links = extract_links(iter_text(r))
+            self.enrich_scrape(search_text)
+        except HTTPError as f:
+            log_msg(
+                f"\n[sciscraper]: {self.base_url} answered {f.response.status_code} while searching for {search_text}.\n"
+            )
+        except RequestException as e:
+            log_msg(
+                f"\n[sciscraper]: An error occurred while searching for {search_text}. Cause of error: {e}\n"
+            )
 
     def enrich_scrape(self, search_text: str):
-        """With the link to download isolated, it is followed and thereby downloaded.
-        It is sent as bytes to a temporary text file, as a middleman of sorts.
-        The temporary text file is then used as a basis to generate a new pdf.
-        The temporary text file is then deleted in preparation for the next pdf.
+        """With the links to download isolated, the pdf is queued for download into research_dir.
+        The links are mirrors of the same paper, so each is only tried if the ones before it failed.
         """
-        for link in self.links:
-            paper_url = f"{link}=true"
-            paper_title = f'{date}_{search_text.replace("/","")}.pdf'
-            time.sleep(1)
-            paper_content = (
-                requests.get(paper_url, stream=True, allow_redirects=True)
-            ).content
-            with open("temp_file.txt", "wb") as _tempfile:
-                _tempfile.write(paper_content)
-            with open(paper_title, "wb") as file:
-                for line in open("temp_file.txt", "rb").readlines():
-                    file.write(line)
-            os.remove("temp_file.txt")
+        if not self.links:
+            return
+        date = datetime.now().strftime("%y%m%d")
+        paper_title = f'{date}_{search_text.replace("/","")}.pdf'
+        paper_urls = [f"{link}=true" for link in self.links]
+        if self.index is not None:
+            self.index.mark_pending(search_text)
+        future = self.downloader.submit(paper_urls, os.path.join(self.research_dir, paper_title))
+        if self.index is not None:
+            future.add_done_callback(lambda done: self.index_download(search_text, done))
+
+    def index_download(self, search_text: str, done: Future) -> None:
+        if done.exception() is not None or done.result() is None:
+            # The downloader has already logged the failure.
+            self.index.discard_pending(search_text)
+            return
+        self.index.add(search_text, done.result())
+
+    def close(self) -> None:
+        self.downloader.close()
+        if self.index is not None:
+            self.index.close()
+
+
+def build_scihub_scraper(
+    config: ScrapeConfig, client: Optional[HttpClient] = None
+) -> SciHubScrape:
+    client = client or build_http_client(config)
+    return SciHubScrape(
+        base_url=config.url_scihub,
+        research_dir=config.research_dir,
+        client=client,
+        downloader=build_downloader(config, client),
+        index=build_download_index(config),
+        link_parser=config.link_parser,
+    )
@@ -8,6 +8,8 @@ class ScrapeResult:
     wordscore: int
     frequency: list[tuple[str, int]]
     study_design: list[tuple[str, int]]
+    decided_early: bool = False
+    pages_skipped: int = 0
 
 
 class Scraper(Protocol):
@@ -0,0 +1,70 @@
+import queue
+import threading
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
+
+import pandas as pd
+
+T = TypeVar("T")
+
+# Marks the end of a prefetched stream.
+_DONE = object()
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Yields lists of up to size items, in order."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def read_column(target: str, column: str, chunk_size: int) -> Iterator[str]:
+    """Yields the non-empty values of one column of a CSV file,
+    reading only chunk_size rows into memory at a time."""
+    with open(target, newline="") as f:
+        for chunk in pd.read_csv(f, usecols=[column], chunksize=chunk_size):
+            for value in chunk[column].dropna():
+                if value != "":
+                    yield value
+
+
+def prefetch(iterable: Iterable[T], maxsize: int) -> Iterator[T]:
+    """Runs the iterable in a background thread, handing its items over through a bounded queue.
+    The producer runs ahead of the consumer by at most maxsize items, so fetching and writing overlap
+    without the results piling up in memory. An error in the producer is raised in the consumer.
+    """
+    items: queue.Queue = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((_DONE, e))
+            return
+        put((_DONE, None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
@@ -0,0 +1,43 @@
+from functools import lru_cache
+from typing import Callable
+
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize
+
+# The only splits NLTK's word tokenizer makes inside a run of word characters.
+# Everything else it does is punctuation handling, which \W+ normalization has already removed.
+CONTRACTIONS = {
+    "cannot": ("can", "not"),
+    "gimme": ("gim", "me"),
+    "gonna": ("gon", "na"),
+    "gotta": ("got", "ta"),
+    "lemme": ("lem", "me"),
+    "wanna": ("wan", "na"),
+}
+
+
+@lru_cache(maxsize=None)
+def stop_words() -> frozenset[str]:
+    """Loads the English stopwords once per process."""
+    return frozenset(stopwords.words("english"))
+
+
+def nltk_tokenize(text: str) -> list[str]:
+    """The reference tokenizer: NLTK's Punkt sentence splitting followed by its word tokenizer."""
+    return word_tokenize(text)
+
+
+def fast_tokenize(text: str) -> list[str]:
+    """Splits text that has already been reduced to lowercase words separated by whitespace.
+    It produces the same tokens as nltk_tokenize on such text.
+    """
+    tokens = []
+    for word in text.split():
+        tokens.extend(CONTRACTIONS.get(word, (word,)))
+    return tokens
+
+
+TOKENIZERS: dict[str, Callable[[str], list[str]]] = {
+    "nltk": nltk_tokenize,
+    "fast": fast_tokenize,
+}
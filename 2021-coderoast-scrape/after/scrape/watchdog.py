@@ -0,0 +1,229 @@
+import json
+import multiprocessing
+import os
+import signal
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from multiprocessing.connection import Connection, wait
+from typing import Callable, Iterable, Iterator, Optional, Sized
+
+from tqdm import tqdm
+
+from scrape.archive import PdfSource
+from scrape.config import ScrapeConfig
+from scrape.log import log_msg
+from scrape.metrics import METRICS
+from scrape.pdf import DocumentCounts, build_pdf_scraper
+
+POLL_INTERVAL = 1.0
+OUT_OF_MEMORY = "ran out of memory"
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Reads a process's resident set size from /proc, or returns None where that is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _serve(conn: Connection, count: Callable) -> None:
+    """Counts one file at a time for as long as the supervisor sends them.
+    The worker leads a process group of its own, so that killing the group also kills any page pool it started.
+    """
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    while True:
+        source = conn.recv()
+        if source is None:
+            return
+        METRICS.reset()
+        try:
+            with source.content() as data:
+                counts, error = count(source.name, data), None
+        except MemoryError:
+            counts, error = None, OUT_OF_MEMORY
+        except Exception as e:
+            counts, error = None, f"{type(e).__name__}: {e}"
+        conn.send((counts, error, METRICS.snapshot()))
+
+
+def _supervised_worker(config: ScrapeConfig, conn: Connection) -> None:
+    _serve(conn, build_pdf_scraper(config).count_words)
+
+
+@dataclass
+class Task:
+    index: int
+    source: PdfSource
+    started: float
+
+
+class Worker:
+    def __init__(self, config: ScrapeConfig, target: Callable = _supervised_worker) -> None:
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=target, args=(config, child_conn))
+        self.process.start()
+        child_conn.close()
+        self.task: Optional[Task] = None
+
+    def assign(self, task: Task) -> None:
+        self.task = task
+        self.conn.send(task.source)
+
+    def exitcode(self) -> Optional[int]:
+        """Returns the exit code of a worker that has died, waiting briefly for it to be reaped."""
+        self.process.join(timeout=POLL_INTERVAL)
+        return self.process.exitcode
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            # No process groups here, or the group is already gone.
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=POLL_INTERVAL)
+        if self.process.is_alive():
+            self.kill()
+
+
+class Supervisor:
+    """The Supervisor class counts each document in a worker process under wall-clock and memory limits.
+    A worker that overruns either limit, runs out of memory or dies is killed and replaced, along with any
+    processes it started. The document it was working on is appended to the quarantine file along with
+    the reason, and is skipped on later runs for as long as its size and mtime stay the same.
+    A fixed or downloaded again copy saved under the same name is scraped again.
+    A document whose scrape merely raises an error is skipped for this run only, since the error may not recur.
+    """
+
+    def __init__(self, config: ScrapeConfig, worker_target: Callable = _supervised_worker) -> None:
+        self.config = config
+        self.worker_target = worker_target
+        self.timeout = config.doc_timeout
+        self.max_memory = config.doc_max_memory
+        self.quarantine_file = config.quarantine_file
+
+    @staticmethod
+    def quarantine_key(source: PdfSource) -> tuple[str, int, float]:
+        return source.name, source.size, source.mtime
+
+    def quarantined(self) -> set[tuple[str, Optional[int], Optional[float]]]:
+        if not os.path.exists(self.quarantine_file):
+            return set()
+        with open(self.quarantine_file) as f:
+            return {
+                (entry["file"], entry.get("size"), entry.get("mtime"))
+                for entry in map(json.loads, filter(str.strip, f))
+            }
+
+    def quarantine(self, source: PdfSource, reason: str) -> None:
+        METRICS.count("documents_quarantined")
+        log_msg(f"\n[sciscraper]: Quarantining {source.name}. Reason: {reason}\n")
+        with open(self.quarantine_file, "a") as f:
+            entry = {
+                "file": source.name,
+                "size": source.size,
+                "mtime": source.mtime,
+                "reason": reason,
+                "time": datetime.now().isoformat(),
+            }
+            f.write(json.dumps(entry) + "\n")
+
+    def overrun(self, worker: Worker, now: float) -> Optional[str]:
+        """Returns why the worker's current task has to be stopped, if it does."""
+        elapsed = now - worker.task.started
+        if self.timeout and elapsed > self.timeout:
+            return f"timed out after {elapsed:.0f} seconds"
+        rss = _rss_bytes(worker.process.pid)
+        if self.max_memory and rss and rss > self.max_memory:
+            return f"used {rss} bytes of memory, over the {self.max_memory} byte limit"
+        return None
+
+    def next_task(
+        self,
+        queue: Iterator[tuple[int, PdfSource]],
+        pending: dict[int, Optional[DocumentCounts]],
+        progress: tqdm,
+    ) -> Optional[Task]:
+        """Takes the next source off the queue, passing over the quarantined ones."""
+        for index, source in queue:
+            if self.quarantine_key(source) not in self.skipped:
+                return Task(index, source, time.monotonic())
+            log_msg(f"\n[sciscraper]: Skipping quarantined {source.name}.\n")
+            pending[index] = None
+            progress.update()
+        return None
+
+    def run(
+        self, sources: Iterable[PdfSource]
+    ) -> Iterator[tuple[int, Optional[DocumentCounts]]]:
+        """Yields the counts of each file in order, with None for the ones that failed or were quarantined."""
+        self.skipped = self.quarantined()
+        queue = enumerate(sources)
+        pending: dict[int, Optional[DocumentCounts]] = {}
+        workers = [Worker(self.config, self.worker_target) for _ in range(max(1, self.config.workers))]
+        next_index = 0
+        progress = tqdm(total=len(sources) if isinstance(sources, Sized) else None)
+        try:
+            while True:
+                for worker in workers:
+                    if worker.task is None:
+                        task = self.next_task(queue, pending, progress)
+                        if task:
+                            worker.assign(task)
+                busy = [worker for worker in workers if worker.task]
+                if not busy:
+                    break
+                ready = wait(
+                    [worker.conn for worker in busy]
+                    + [worker.process.sentinel for worker in busy],
+                    timeout=POLL_INTERVAL,
+                )
+                for position, worker in enumerate(workers):
+                    task = worker.task
+                    if task is None:
+                        continue
+                    reason = None
+                    if worker.conn in ready:
+                        try:
+                            counts, error, snapshot = worker.conn.recv()
+                            METRICS.merge(snapshot)
+                        except EOFError:
+                            counts, error = None, None
+                            reason = f"worker died with exit code {worker.exitcode()}"
+                        if error == OUT_OF_MEMORY:
+                            reason = error
+                        elif error:
+                            METRICS.count("documents_failed")
+                            log_msg(f"\n[sciscraper]: Skipping {task.source.name}. Cause of error: {error}\n")
+                        pending[task.index] = counts
+                        worker.task = None
+                    elif worker.process.sentinel in ready:
+                        reason = f"worker died with exit code {worker.exitcode()}"
+                    else:
+                        reason = self.overrun(worker, time.monotonic())
+                    if reason:
+                        worker.kill()
+                        self.quarantine(task.source, reason)
+                        pending[task.index] = None
+                        workers[position] = Worker(self.config, self.worker_target)
+                    if task.index in pending:
+                        progress.update()
+                while next_index in pending:
+                    yield next_index, pending.pop(next_index)
+                    next_index += 1
+            yield from sorted(pending.items())
+        finally:
+            progress.close()
+            for worker in workers:
+                worker.stop()
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from scrape.archive import iter_pdf_sources
+
+
+class TestPdfSources(unittest.TestCase):
+    def test_reads_loose_files_and_archive_members(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "loose.pdf"), "wb") as f:
+                f.write(b"%PDF loose")
+            with open(os.path.join(tmp, "notes.txt"), "w") as f:
+                f.write("not a paper")
+            with zipfile.ZipFile(os.path.join(tmp, "bundle.zip"), "w") as archive:
+                archive.writestr("papers/zipped.pdf", b"%PDF zipped")
+                archive.writestr("papers/readme.txt", b"skip me")
+            member = os.path.join(tmp, "tarred.pdf")
+            with open(member, "wb") as f:
+                f.write(b"%PDF tarred")
+            with tarfile.open(os.path.join(tmp, "bundle.tar.gz"), "w:gz") as archive:
+                archive.add(member, arcname="tarred.pdf")
+            os.remove(member)
+
+            sources = list(iter_pdf_sources(tmp))
+
+            self.assertEqual(
+                [os.path.relpath(source.name, tmp) for source in sources],
+                [
+                    os.path.join("bundle.tar.gz", "tarred.pdf"),
+                    os.path.join("bundle.zip", "papers", "zipped.pdf"),
+                    "loose.pdf",
+                ],
+            )
+            contents = []
+            for source in sources:
+                with source.content() as data:
+                    contents.append(None if data is None else data.read())
+            self.assertEqual(contents, [b"%PDF tarred", b"%PDF zipped", None])
+            self.assertEqual([source.size for source in sources], [11, 11, 10])
+            self.assertEqual(
+                [source.digest() for source in sources],
+                [
+                    hashlib.sha256(content).hexdigest()
+                    for content in (b"%PDF tarred", b"%PDF zipped", b"%PDF loose")
+                ],
+            )
+
+    def test_tar_members_are_read_in_any_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with tarfile.open(os.path.join(tmp, "bundle.tar.bz2"), "w:bz2") as archive:
+                for number in range(3):
+                    member = os.path.join(tmp, f"paper{number}.pdf")
+                    with open(member, "wb") as f:
+                        f.write(b"%PDF " + bytes([number]) * (number + 1) * 1000)
+                    archive.add(member, arcname=f"paper{number}.pdf")
+                    os.remove(member)
+
+            sources = list(iter_pdf_sources(tmp))
+
+            for source in [sources[2], sources[0], sources[1], sources[2]]:
+                number = int(source.member[5])
+                with source.content() as data:
+                    self.assertEqual(data.read(), b"%PDF " + bytes([number]) * (number + 1) * 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from scrape.cache import DiskCache, PageCache, ResponseCache, file_digest
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PageCache(os.path.join(self.tmp.name, "cache"), 1 << 20)
+        self.paper = os.path.join(self.tmp.name, "paper.pdf")
+        with open(self.paper, "wb") as f:
+            f.write(b"%PDF-1.4 not really a pdf")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        key = PageCache.key(file_digest(self.paper), {"x_tolerance": 3})
+        self.assertIsNone(self.cache.load(key))
+        pages = ["first page\nwith lines", "", None]
+        self.assertEqual(list(self.cache.record(key, pages)), pages)
+        self.assertEqual(list(self.cache.load(key)), pages)
+
+    def test_partial_read_is_not_committed(self):
+        key = PageCache.key(file_digest(self.paper), {"x_tolerance": 3})
+        pages = self.cache.record(key, ["one", "two"])
+        next(pages)
+        pages.close()
+        self.assertIsNone(self.cache.load(key))
+
+    def test_key_depends_on_content_and_params(self):
+        key = PageCache.key(file_digest(self.paper), {"x_tolerance": 3})
+        self.assertNotEqual(
+            key, PageCache.key(file_digest(self.paper), {"x_tolerance": 2})
+        )
+        copy = os.path.join(self.tmp.name, "renamed.pdf")
+        with open(self.paper, "rb") as src, open(copy, "wb") as dst:
+            dst.write(src.read())
+        self.assertEqual(key, PageCache.key(file_digest(copy), {"x_tolerance": 3}))
+        with open(copy, "ab") as f:
+            f.write(b"changed")
+        self.assertNotEqual(key, PageCache.key(file_digest(copy), {"x_tolerance": 3}))
+
+
+class TestDiskCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(tmp, max_bytes=250)
+            for key in ["aa1", "bb2"]:
+                with cache.write(key) as f:
+                    f.write(b"x" * 100)
+            os.utime(cache.path("aa1"), (0, 0))
+            os.utime(cache.path("bb2"), (1, 1))
+            cache.open("aa1").close()  # touching aa1 makes bb2 the oldest entry
+            with cache.write("cc3") as f:
+                f.write(b"x" * 100)
+            self.assertIsNone(cache.open("bb2"))
+            for key in ["aa1", "cc3"]:
+                with cache.open(key) as f:
+                    self.assertEqual(len(f.read()), 100)
+
+    def test_directory_is_only_walked_when_it_may_be_too_big(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(tmp, max_bytes=250)
+            with mock.patch("scrape.cache.os.walk", wraps=os.walk) as walk:
+                for key in ["aa1", "bb2"]:
+                    with cache.write(key) as f:
+                        f.write(b"x" * 100)
+                # The first write finds out how full the directory already is, and the second fits.
+                self.assertEqual(walk.call_count, 1)
+                with cache.write("cc3") as f:
+                    f.write(b"x" * 100)
+                self.assertEqual(walk.call_count, 2)
+            self.assertEqual(cache.used_bytes, 200)
+
+    def test_failed_write_leaves_no_entry(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(tmp, max_bytes=1 << 20)
+            with self.assertRaises(ValueError):
+                with cache.write("dd4") as f:
+                    f.write(b"partial")
+                    raise ValueError
+            self.assertIsNone(cache.open("dd4"))
+            self.assertEqual(os.listdir(os.path.dirname(cache.path("dd4"))), [])
+
+
+class TestResponseCache(unittest.TestCase):
+    URL = "https://app.dimensions.ai/discover/publication/results.json"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.tmp.name, 1 << 20, ttl=60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_ignores_case_and_padding_of_search_text(self):
+        query = {"search_text": "10.1000/ABC", "search_field": "doi", "search_mode": "content"}
+        self.assertEqual(
+            ResponseCache.key(self.URL, query),
+            ResponseCache.key(self.URL, {**query, "search_text": " 10.1000/abc "}),
+        )
+        self.assertNotEqual(
+            ResponseCache.key(self.URL, query),
+            ResponseCache.key(self.URL, {**query, "search_field": "full_search"}),
+        )
+
+    def test_expired_entries_are_misses(self):
+        key = ResponseCache.key(self.URL, {"search_text": "10.1000/abc"})
+        self.cache.save(key, '{"docs": []}')
+        self.assertEqual(self.cache.load(key), '{"docs": []}')
+        self.cache.ttl = 0
+        time.sleep(0.01)
+        self.assertIsNone(self.cache.load(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from scrape.crawl import CitationCrawler, CrawlStore
+from scrape.http import HttpClient
+from scrape.json import JSONScrape
+from scrape.ratelimit import RateController
+
+
+class CitationGraphStandIn(BaseHTTPRequestHandler):
+    """A binary tree of publications: pub.N cites pub.2N and pub.2N+1, and has been cited N times.
+    The DOI 10.1000/N is publication pub.N.
+    """
+
+    searched: list[str] = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        search_text = query["search_text"][0]
+        self.searched.append(search_text)
+        number = int(search_text.replace("pub.", "").replace("10.1000/", ""))
+        doc = {
+            "id": f"pub.{number}",
+            "doi": f"10.1000/{number}",
+            "title": f"Paper {number}",
+            "times_cited": number,
+            "cited_dimensions_ids": [f"pub.{2 * number}", f"pub.{2 * number + 1}"],
+        }
+        body = json.dumps({"docs": [doc]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCitationCrawler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), CitationGraphStandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/results.json"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        CitationGraphStandIn.searched = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.nodes_file = os.path.join(self.tmp.name, "nodes.jsonl")
+        self.edges_file = os.path.join(self.tmp.name, "edges.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def crawl(self, seeds, **kwargs):
+        rates = RateController(rate=1000, burst=100, min_rate=1000, max_rate=1000)
+        store = CrawlStore(os.path.join(self.tmp.name, "crawl.sqlite"))
+        crawler = CitationCrawler(
+            scraper=JSONScrape(self.url, client=HttpClient(rates=rates)),
+            store=store,
+            nodes_file=self.nodes_file,
+            edges_file=self.edges_file,
+            concurrency=2,
+            **kwargs,
+        )
+        try:
+            return crawler.run(seeds)
+        finally:
+            store.close()
+
+    def nodes(self):
+        with open(self.nodes_file) as f:
+            return [json.loads(line) for line in f]
+
+    def edges(self):
+        with open(self.edges_file, newline="") as f:
+            return list(csv.reader(f))
+
+    def test_breadth_first_to_max_depth(self):
+        self.assertEqual(self.crawl(["10.1000/1"], max_depth=2), 7)
+        self.assertEqual([node["id"] for node in self.nodes()], [f"pub.{n}" for n in range(1, 8)])
+        self.assertEqual([node["depth"] for node in self.nodes()], [0, 1, 1, 2, 2, 2, 2])
+        edges = self.edges()
+        self.assertEqual(edges[0], ["source", "target"])
+        self.assertEqual(len(edges) - 1, 14)
+        self.assertIn(["pub.7", "pub.15"], edges)
+
+    def test_resumes_within_the_node_budget(self):
+        self.assertEqual(self.crawl(["pub.1"], max_depth=10, max_nodes=3), 3)
+        self.assertEqual(self.crawl(["pub.1"], max_depth=10, max_nodes=7), 4)
+        self.assertEqual(len(self.nodes()), 7)
+        self.assertEqual(len(set(CitationGraphStandIn.searched)), 7)
+        self.assertEqual(len(self.edges()), 1 + 14)
+
+    def test_times_cited_priority(self):
+        self.crawl(["pub.1"], max_depth=10, max_nodes=4, priority="times_cited")
+        # The papers cited by the most cited paper found so far go first.
+        self.assertEqual([node["id"] for node in self.nodes()], ["pub.1", "pub.2", "pub.3", "pub.6"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from scrape.download import ORIGIN_SUFFIX, PARTIAL_SUFFIX, Downloader
+from scrape.http import HttpClient
+from scrape.metrics import METRICS
+from scrape.ratelimit import RateController
+from scrape.scihub import SciHubScrape
+
+PAPER = bytes(range(256)) * 400
+ETAG = '"paper-v1"'
+
+
+class PaperStandIn(BaseHTTPRequestHandler):
+    """Serves PAPER under any /paper/ path, honouring Range requests.
+    "cut" drops the connection half way through the first response, and "norange" does too but ignores ranges.
+    "missing" is a 404, and "slow" takes a moment, so that overlapping downloads can be counted.
+    Every file carries ETAG, and a range whose If-Range does not match it is answered with the whole file.
+    A POST is answered with a search result page linking to "cut" by way of "missing".
+    """
+
+    requests: list[tuple[str, str]] = []
+    in_flight = 0
+    most_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        base = f"http://127.0.0.1:{self.server.server_port}/paper"
+        body = (
+            "<html><body><div id='buttons'>"
+            f"<button onclick=\"location.href='{base}/missing.pdf?download=true'\">mirror</button>"
+            f"<button onclick=\"location.href='{base}/cut.pdf?download=true'\">save</button>"
+            "</div></body></html>"
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        name = os.path.basename(urlparse(self.path).path)
+        byte_range = self.headers.get("Range", "")
+        if self.headers.get("If-Range", ETAG) != ETAG:
+            byte_range = ""
+        with self.lock:
+            first = not any(seen == name for seen, _ in self.requests)
+            self.requests.append((name, byte_range))
+            PaperStandIn.in_flight += 1
+            PaperStandIn.most_in_flight = max(PaperStandIn.most_in_flight, PaperStandIn.in_flight)
+        try:
+            self.serve(name, byte_range, first)
+        finally:
+            with self.lock:
+                PaperStandIn.in_flight -= 1
+
+    def serve(self, name, byte_range, first):
+        if name.startswith("missing"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if name.startswith("slow"):
+            time.sleep(0.2)
+        start = 0
+        if byte_range and not name.startswith("norange"):
+            start = int(byte_range[len("bytes="):].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(PAPER) - 1}/{len(PAPER)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        body = PAPER[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if first and (name.startswith("cut") or name.startswith("norange")):
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.connection.close()
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDownloader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), PaperStandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/paper"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        PaperStandIn.requests = []
+        PaperStandIn.most_in_flight = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        rates = RateController(rate=1000, burst=100, min_rate=1000, max_rate=1000)
+        self.client = HttpClient(rates=rates)
+        self.downloader = Downloader(self.client, workers=3, chunk_size=1024)
+
+    def tearDown(self):
+        self.downloader.close()
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def read(self, name):
+        with open(self.path(name), "rb") as file:
+            return file.read()
+
+    def leave_partial(self, name, origin):
+        with open(self.path(name + PARTIAL_SUFFIX), "wb") as file:
+            file.write(PAPER[:1000])
+        with open(self.path(name + ORIGIN_SUFFIX), "w") as file:
+            json.dump(origin, file)
+
+    def test_cut_off_download_resumes_with_a_range(self):
+        self.assertEqual(self.downloader.download([f"{self.url}/cut.pdf"], self.path("cut.pdf")), self.path("cut.pdf"))
+        self.assertEqual(self.read("cut.pdf"), PAPER)
+        self.assertFalse(os.path.exists(self.path("cut.pdf" + PARTIAL_SUFFIX)))
+        self.assertEqual(PaperStandIn.requests, [("cut.pdf", ""), ("cut.pdf", f"bytes={len(PAPER) // 2}-")])
+
+    def test_partial_file_of_an_earlier_run_is_finished(self):
+        self.leave_partial("paper.pdf", {"url": f"{self.url}/paper.pdf"})
+        self.downloader.download([f"{self.url}/paper.pdf"], self.path("paper.pdf"))
+        self.assertEqual(self.read("paper.pdf"), PAPER)
+        self.assertEqual(PaperStandIn.requests, [("paper.pdf", "bytes=1000-")])
+        self.assertFalse(os.path.exists(self.path("paper.pdf" + ORIGIN_SUFFIX)))
+
+    def test_partial_file_is_resumed_from_another_mirror_only_if_it_is_the_same_file(self):
+        self.leave_partial("same.pdf", {"url": f"{self.url}/mirror.pdf", "etag": ETAG})
+        self.downloader.download([f"{self.url}/same.pdf"], self.path("same.pdf"))
+        self.leave_partial("changed.pdf", {"url": f"{self.url}/mirror.pdf", "etag": '"paper-v0"'})
+        self.downloader.download([f"{self.url}/changed.pdf"], self.path("changed.pdf"))
+        self.leave_partial("unknown.pdf", {"url": f"{self.url}/mirror.pdf"})
+        self.downloader.download([f"{self.url}/unknown.pdf"], self.path("unknown.pdf"))
+        self.assertEqual(
+            PaperStandIn.requests,
+            [("same.pdf", "bytes=1000-"), ("changed.pdf", ""), ("unknown.pdf", "")],
+        )
+        for name in ["same.pdf", "changed.pdf", "unknown.pdf"]:
+            self.assertEqual(self.read(name), PAPER)
+
+    def test_a_destination_is_only_downloaded_once(self):
+        futures = [self.downloader.submit([f"{self.url}/slow.pdf"], self.path("slow.pdf")) for _ in range(3)]
+        self.assertTrue(all(future is futures[0] for future in futures))
+        self.assertEqual(futures[0].result(), self.path("slow.pdf"))
+        self.assertEqual(PaperStandIn.requests, [("slow.pdf", "")])
+
+    def test_a_download_that_raises_is_logged_and_counted(self):
+        blocker = self.path("blocker")
+        with open(blocker, "w") as file:
+            file.write("a file where a folder should be")
+        METRICS.reset()
+        future = self.downloader.submit([f"{self.url}/paper.pdf"], os.path.join(blocker, "paper.pdf"))
+        self.assertIsInstance(future.exception(), OSError)
+        self.downloader.close()
+        self.assertEqual(METRICS.counters["downloads_failed"], 1)
+
+    def test_server_ignoring_ranges_sends_the_whole_file(self):
+        self.downloader.download([f"{self.url}/norange.pdf"], self.path("norange.pdf"))
+        self.assertEqual(self.read("norange.pdf"), PAPER)
+
+    def test_mirrors_are_tried_in_turn(self):
+        urls = [f"{self.url}/missing.pdf", f"{self.url}/paper.pdf"]
+        self.downloader.download(urls, self.path("paper.pdf"))
+        self.assertEqual(self.read("paper.pdf"), PAPER)
+        self.assertEqual([name for name, _ in PaperStandIn.requests], ["missing.pdf", "paper.pdf"])
+        self.assertIsNone(self.downloader.download([f"{self.url}/missing.pdf"], self.path("gone.pdf")))
+        self.assertFalse(os.path.exists(self.path("gone.pdf")))
+
+    def test_downloads_overlap_within_the_pool(self):
+        futures = [
+            self.downloader.submit([f"{self.url}/slow{number}.pdf"], self.path(f"slow{number}.pdf"))
+            for number in range(6)
+        ]
+        self.assertTrue(all(future.result() for future in futures))
+        self.assertGreater(PaperStandIn.most_in_flight, 1)
+        self.assertLessEqual(PaperStandIn.most_in_flight, 3)
+
+    def test_scihub_scrape_downloads_the_linked_paper(self):
+        scraper = SciHubScrape(self.url, self.tmp.name, client=self.client, downloader=self.downloader)
+        scraper.scrape("10.1000/xyz")
+        scraper.close()
+        [paper] = [name for name in os.listdir(self.tmp.name)]
+        self.assertTrue(paper.endswith("_10.1000xyz.pdf"))
+        self.assertEqual(self.read(paper), PAPER)
+
+
+if __name__ == "__main__":
+    unittest.main()
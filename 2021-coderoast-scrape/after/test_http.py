@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from scrape.http import AccessDenied, HttpClient
+from scrape.json import JSONScrape
+from scrape.metrics import METRICS
+from scrape.ratelimit import RateController
+
+
+class FlakyStandIn(BaseHTTPRequestHandler):
+    """Answers by search text: "flaky" fails twice with a 502 before succeeding,
+    "slow" takes longer than the client's read timeout, "denied" is refused with a 403,
+    and "throttled" and "forbidden_for_now" are answered with a 429 and a 403 with a Retry-After header the first time.
+    """
+
+    protocol_version = "HTTP/1.1"
+    attempts: dict[str, int] = {}
+    client_ports: set[int] = set()
+
+    def do_GET(self):
+        self.client_ports.add(self.client_address[1])
+        search_text = parse_qs(urlparse(self.path).query)["search_text"][0]
+        attempt = self.attempts[search_text] = self.attempts.get(search_text, 0) + 1
+        if search_text == "slow":
+            time.sleep(0.5)
+        if search_text == "flaky" and attempt <= 2:
+            status = 502
+        elif search_text == "denied":
+            status = 403
+        elif search_text == "throttled" and attempt == 1:
+            status = 429
+        elif search_text == "forbidden_for_now" and attempt == 1:
+            status = 403
+        else:
+            status = 200
+        body = json.dumps({"docs": [{"doi": search_text}]}).encode()
+        self.send_response(status)
+        if status == 429 or search_text == "forbidden_for_now":
+            self.send_header("Retry-After", "0.3")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyStandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/results.json"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FlakyStandIn.attempts.clear()
+        FlakyStandIn.client_ports.clear()
+        METRICS.reset()
+        rates = RateController(rate=100, burst=10, max_rate=100)
+        client = HttpClient(read_timeout=0.2, retries=2, backoff=0, rates=rates, throttle_retries=1)
+        self.scraper = JSONScrape(self.url, client=client)
+
+    def test_server_errors_are_retried(self):
+        self.assertEqual(self.scraper.search("flaky")["doi"], "flaky")
+        self.assertEqual(FlakyStandIn.attempts["flaky"], 3)
+        self.assertEqual(METRICS.counters["http_retries"], 2)
+
+    def test_read_timeout(self):
+        self.assertIsNone(self.scraper.search("slow"))
+        # The request that timed out is still timed.
+        self.assertEqual(METRICS.counters["http_request_failures"], 1)
+        self.assertEqual(sum(METRICS.histograms["http_request_seconds"].counts), 1)
+        self.assertGreaterEqual(METRICS.stages["http"].wall, 0.2)
+
+    def test_throttled_search_pauses_and_resumes(self):
+        start = time.monotonic()
+        self.assertEqual(self.scraper.search("throttled")["doi"], "throttled")
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(FlakyStandIn.attempts["throttled"], 2)
+        self.assertEqual(METRICS.counters["throttle_events"], 1)
+        host = urlparse(self.url).netloc
+        self.assertLess(self.scraper.client.rates.rates()[host], 100)
+
+    def test_access_denied_ends_the_run(self):
+        with self.assertRaises(AccessDenied):
+            self.scraper.search("denied")
+        # A 403 without a Retry-After is not throttling, so it is not sent again.
+        self.assertEqual(FlakyStandIn.attempts["denied"], 1)
+        self.assertNotIn("throttle_events", METRICS.counters)
+
+    def test_forbidden_with_retry_after_is_throttling(self):
+        self.assertEqual(self.scraper.search("forbidden_for_now")["doi"], "forbidden_for_now")
+        self.assertEqual(FlakyStandIn.attempts["forbidden_for_now"], 2)
+        self.assertEqual(METRICS.counters["throttle_events"], 1)
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            self.scraper.search("fine")
+        self.assertEqual(len(FlakyStandIn.client_ports), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
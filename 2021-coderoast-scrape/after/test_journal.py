@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+
+from scrape.config import ScrapeConfig
+from scrape.fetch import journaled_pdf_results
+from scrape.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal_file = os.path.join(self.tmp.name, "journal.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resume_skips_finished_inputs(self):
+        with Journal(self.journal_file, sync_every=2) as journal:
+            journal.record("10.1000/A", {"title": "A"})
+            journal.record("10.1000/b", None)
+            self.assertNotIn("10.1000/a", journal)
+        with Journal(self.journal_file, resume=True) as journal:
+            self.assertIn(" 10.1000/a", journal)
+            # Failed inputs are tried again.
+            self.assertNotIn("10.1000/b", journal)
+            journal.record("10.1000/b", {"title": "B"})
+            self.assertEqual(
+                list(journal.rows()), [("10.1000/a", {"title": "A"}), ("10.1000/b", {"title": "B"})]
+            )
+
+    def test_a_fresh_run_starts_a_new_journal(self):
+        with Journal(self.journal_file) as journal:
+            journal.record("pub.1", {"title": "One"})
+        with Journal(self.journal_file, overwrite=True) as journal:
+            self.assertNotIn("pub.1", journal)
+            self.assertEqual(list(journal.rows()), [])
+
+    def test_a_journal_is_not_overwritten_unless_asked(self):
+        with Journal(self.journal_file) as journal:
+            journal.record("pub.1", {"title": "One"})
+        with self.assertRaises(FileExistsError):
+            Journal(self.journal_file)
+        with Journal(self.journal_file, resume=True) as journal:
+            self.assertIn("pub.1", journal)
+        # An empty journal holds no progress to lose.
+        with Journal(self.journal_file, overwrite=True):
+            pass
+        with Journal(self.journal_file):
+            pass
+
+    def test_a_half_written_line_is_cut_off(self):
+        with Journal(self.journal_file) as journal:
+            journal.record("pub.1", {"title": "One"})
+        with open(self.journal_file, "a") as file:
+            file.write('{"key": "pub.2", "ro')
+        with Journal(self.journal_file, resume=True) as journal:
+            journal.record("pub.2", {"title": "Two"})
+            self.assertEqual([key for key, _ in journal.rows()], ["pub.1", "pub.2"])
+
+    def test_pdf_results_are_scored_within_one_sync_interval(self):
+        config = ScrapeConfig("", "", "", "", "", self.tmp.name, "", "", "", score_window=1000)
+        windows = []
+
+        def scrape(sources, config, window):
+            windows.append(window)
+            return iter(())
+
+        with mock.patch("scrape.fetch.iter_scrape_pdf_files", scrape):
+            with Journal(self.journal_file, sync_every=5) as journal:
+                list(journaled_pdf_results(config, journal))
+            list(journaled_pdf_results(config, None))
+        self.assertEqual(windows, [5, 1000])
+
+    def test_a_finished_run_leaves_no_journal_behind(self):
+        config_file = os.path.join(self.tmp.name, "config.json")
+        with open(config_file, "w") as file:
+            json.dump(
+                {
+                    **ScrapeConfig("", "", "", "", "", "", "", "", "").__dict__,
+                    "export_dir": os.path.join(self.tmp.name, "exports"),
+                    "journal_file": self.journal_file,
+                    "run_report": os.path.join(self.tmp.name, "run_report.json"),
+                },
+                file,
+            )
+
+        def scrape(config, journal):
+            journal.record("pub.1", {"title": "One"})
+            return iter([{"title": "One"}])
+
+        with mock.patch("main.stream_terms_from_pdf_files", scrape):
+            with mock.patch("sys.argv", ["main.py", "--config", config_file]):
+                main.main()
+                self.assertFalse(os.path.exists(self.journal_file))
+                # Nothing is left over to resume, so the next run starts without being told to.
+                main.main()
+                self.assertFalse(os.path.exists(self.journal_file))
+
+    def test_an_unfinished_run_is_not_started_over_unasked(self):
+        with Journal(self.journal_file) as journal:
+            journal.record("pub.1", {"title": "One"})
+        config = ScrapeConfig("", "", "", "", "", "", "", "", "", journal_file=self.journal_file)
+        with mock.patch("main.read_config", return_value=config):
+            with mock.patch("sys.argv", ["main.py"]), self.assertRaises(SystemExit):
+                main.main()
+        self.assertTrue(os.path.exists(self.journal_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from scrape.lexicon import LexiconMatcher, read_terms
+
+
+class TestLexiconMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = LexiconMatcher(
+            ["randomized controlled trial", "controlled", "trial", "big data", "data"]
+        )
+
+    def test_finds_overlapping_terms(self):
+        self.assertEqual(
+            list(self.matcher.find("a randomized controlled trial of big data")),
+            [
+                (2, "controlled"),
+                (1, "randomized controlled trial"),
+                (3, "trial"),
+                (5, "big data"),
+                (6, "data"),
+            ],
+        )
+
+    def test_count(self):
+        counts = self.matcher.count("trial big trial randomized controlled")
+        self.assertEqual(counts, {"trial": 2, "controlled": 1})
+
+    def test_matches_whole_words_only(self):
+        self.assertEqual(self.matcher.count("trials metadata databases"), {})
+
+    def test_read_terms_strips_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            word_file = os.path.join(tmp, "words.txt")
+            with open(word_file, "w") as f:
+                f.write("Big Data\nsurvey\n\n  Meta-analysis \n")
+            self.assertEqual(read_terms(word_file), {"big data", "survey", "meta analysis"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import glob
+import os
+import unittest
+
+from scrape.links import extract_links, extract_links_with_soup, iter_text
+
+PAGES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "bench", "pages", "*.html")))
+PAGE = (
+    "<html><body><div id='buttons'>"
+    "<BUTTON onclick=\"location.href='//a.org/1.pdf?download=true'\">save</BUTTON>"
+    "<button onclick=\"print()\">print</button>"
+    "<button onclick=\"location.href=&#39;//b.org/2.pdf?download=true&#39;\">mirror</button>"
+    "<a onclick=\"location.href='//c.org/3.pdf?download=true'\">not a button</a>"
+    "</div></body></html>"
+)
+
+
+class FakeResponse:
+    encoding = "utf-8"
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+
+class TestLinkExtractors(unittest.TestCase):
+    def test_saved_pages_give_identical_links(self):
+        self.assertTrue(PAGES)
+        for path_name in PAGES:
+            with open(path_name, encoding="utf-8") as f:
+                html = f.read()
+            with self.subTest(page=os.path.basename(path_name)):
+                self.assertEqual(extract_links([html]), extract_links_with_soup(html))
+
+    def test_chunks_can_split_anywhere(self):
+        expected = ["//a.org/1.pdf?download", "//b.org/2.pdf?download"]
+        self.assertEqual(extract_links_with_soup(PAGE), expected)
+        for split in range(len(PAGE)):
+            self.assertEqual(extract_links([PAGE[:split], PAGE[split:]]), expected)
+
+    def test_text_is_decoded_across_chunks(self):
+        html = "<p>Ökologie — Zürich</p>" + PAGE
+        text = "".join(iter_text(FakeResponse(html.encode()), chunk_size=3))
+        self.assertEqual(text, html)
+
+
+if __name__ == "__main__":
+    unittest.main()
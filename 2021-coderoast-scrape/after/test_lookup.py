@@ -0,0 +1,236 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from scrape.cache import ResponseCache
+from scrape.fetch import fetch_terms_from_pubid, stream_terms_from_doi
+from scrape.http import HttpClient
+from scrape.journal import Journal
+from scrape.json import JSONScrape
+from scrape.lookup import search_all
+from scrape.ratelimit import RateController
+
+
+class DimensionsStandIn(BaseHTTPRequestHandler):
+    """Answers each identifier in a search with a document titled after it, and a 404 for a lone DOI containing "broken".
+    Identifiers containing "shy" or "broken" are left out of the answers to batched searches.
+    A publication ID search also finds a paper citing it, listed before and after the one searched for.
+    """
+
+    requests = 0
+    in_flight = 0
+    most_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        search_text = query["search_text"][0]
+        terms = search_text.split(" ")
+        with self.lock:
+            DimensionsStandIn.requests += 1
+            DimensionsStandIn.in_flight += 1
+            DimensionsStandIn.most_in_flight = max(
+                DimensionsStandIn.most_in_flight, DimensionsStandIn.in_flight
+            )
+        time.sleep(0.05)
+        with self.lock:
+            DimensionsStandIn.in_flight -= 1
+        if "broken" in search_text and len(terms) == 1:
+            self.send_response(404)
+            self.end_headers()
+            return
+        docs = []
+        for term in terms:
+            if len(terms) > 1 and ("shy" in term or "broken" in term):
+                continue
+            if query["search_field"][0] == "doi":
+                docs.append({"doi": term, "title": f"On {term}"})
+            else:
+                citing = {"id": "pub.citing", "title": f"Citing {term}"}
+                docs += [citing, {"id": term, "title": f"On {term}"}, citing]
+        body = json.dumps({"docs": docs})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSearchAll(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), DimensionsStandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/results.json"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        DimensionsStandIn.most_in_flight = 0
+
+    def scraper_at(self, rate, burst, **kwargs):
+        """A scraper held to a fixed rate, so that the timings do not depend on the rate controller."""
+        rates = RateController(rate=rate, burst=burst, min_rate=rate, max_rate=rate)
+        return JSONScrape(self.url, client=HttpClient(rates=rates), **kwargs)
+
+    def test_results_keep_their_order(self):
+        dois = [f"10.1000/{number}" for number in range(20)]
+        scraper = self.scraper_at(rate=1000, burst=20)
+        results = search_all(scraper, dois, concurrency=5)
+        self.assertEqual([result["doi"] for result in results], dois)
+        self.assertEqual(results[3]["title"], "On 10.1000/3")
+        self.assertGreater(DimensionsStandIn.most_in_flight, 1)
+        self.assertLessEqual(DimensionsStandIn.most_in_flight, 5)
+
+    def test_matches_sequential_scrape(self):
+        dois = ["10.1000/a", "10.1000/b"]
+        scraper = self.scraper_at(rate=1000, burst=2)
+        self.assertEqual(
+            search_all(scraper, dois, concurrency=2),
+            [scraper.scrape(doi) for doi in dois],
+        )
+
+    def test_failures_are_isolated(self):
+        dois = ["10.1000/1", "10.1000/broken", "10.1000/3"]
+        scraper = self.scraper_at(rate=1000, burst=3)
+        results = search_all(scraper, dois, concurrency=3)
+        self.assertIsNone(results[1])
+        self.assertEqual(results[2]["doi"], "10.1000/3")
+
+    def test_rate_budget(self):
+        dois = [f"10.1000/{number}" for number in range(6)]
+        scraper = self.scraper_at(rate=20, burst=1)
+        start = time.monotonic()
+        search_all(scraper, dois, concurrency=6)
+        # The first search goes straight away, and the other five wait 1/20th of a second each.
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 20)
+
+    def test_cached_searches_skip_the_website_and_the_limiter(self):
+        dois = [f"10.1000/cached{number}" for number in range(10)]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(tmp, 1 << 20)
+            first = search_all(self.scraper_at(rate=1000, burst=10, cache=cache), dois, 5)
+            DimensionsStandIn.requests = 0
+            # At this rate, ten searches sent to the website would take over a minute.
+            scraper = self.scraper_at(rate=0.1, burst=1, cache=cache)
+            start = time.monotonic()
+            self.assertEqual(search_all(scraper, dois, concurrency=5), first)
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertEqual(DimensionsStandIn.requests, 0)
+
+    def test_each_lookup_reads_the_cache_once(self):
+        dois = [f"10.1000/once{number}" for number in range(4)]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(tmp, 1 << 20)
+            search_all(self.scraper_at(rate=1000, burst=4, cache=cache), dois, 2)
+            with mock.patch.object(cache, "load", wraps=cache.load) as load:
+                scraper = self.scraper_at(rate=1000, burst=4, cache=cache)
+                search_all(scraper, dois, concurrency=2, batch_size=2)
+                self.assertEqual(load.call_count, len(dois))
+                self.assertEqual(scraper.scrape(dois[0])["doi"], dois[0])
+                self.assertEqual(load.call_count, len(dois) + 1)
+            self.assertEqual(scraper.read_ahead, {})
+
+    def test_cache_only_mode_stays_offline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(tmp, 1 << 20)
+            self.scraper_at(rate=1000, burst=1, cache=cache).scrape("10.1000/seen")
+            DimensionsStandIn.requests = 0
+            scraper = self.scraper_at(rate=1000, burst=2, cache=cache, cache_only=True)
+            results = search_all(scraper, ["10.1000/SEEN", "10.1000/unseen"], concurrency=2)
+            self.assertEqual(results[0]["doi"], "10.1000/seen")
+            self.assertIsNone(results[1])
+            self.assertEqual(DimensionsStandIn.requests, 0)
+
+    def test_batches_cut_round_trips(self):
+        dois = [f"10.1000/batch{number}" for number in range(100)]
+        DimensionsStandIn.requests = 0
+        single = search_all(self.scraper_at(rate=1000, burst=100), dois, concurrency=4)
+        self.assertEqual(DimensionsStandIn.requests, 100)
+        DimensionsStandIn.requests = 0
+        batched = search_all(
+            self.scraper_at(rate=1000, burst=100), dois, concurrency=4, batch_size=20
+        )
+        self.assertEqual(DimensionsStandIn.requests, 5)
+        self.assertEqual(batched, single)
+
+    def test_identifiers_missing_from_a_batch_are_looked_up_alone(self):
+        terms = ["10.1000/1", "pub.1", "10.1000/shy", "pub.2", "10.1000/broken", "10.1000/4"]
+        DimensionsStandIn.requests = 0
+        results = search_all(
+            self.scraper_at(rate=1000, burst=10), terms, concurrency=2, batch_size=5
+        )
+        # One batch of DOIs and one of publication IDs, then "shy" and "broken" alone.
+        self.assertEqual(DimensionsStandIn.requests, 4)
+        self.assertEqual(results[2]["doi"], "10.1000/shy")
+        self.assertIsNone(results[4])
+        self.assertEqual([results[1]["id"], results[3]["id"]], ["pub.1", "pub.2"])
+
+    def test_search_keeps_the_document_it_was_for(self):
+        result = self.scraper_at(rate=1000, burst=1).scrape("pub.123")
+        self.assertEqual(result["id"], "pub.123")
+
+    def test_pubid_expansion_looks_up_each_citation_once(self):
+        target = pd.DataFrame(
+            {
+                "title": ["First", "Second", "Third"],
+                "cited_dimensions_ids": [
+                    ["pub.1", "pub.2"],
+                    ["pub.2", "10.1000/broken", "pub.3"],
+                    "",
+                ],
+            }
+        )
+        DimensionsStandIn.requests = 0
+        expanded = fetch_terms_from_pubid(target, self.scraper_at(rate=1000, burst=10))
+        # pub.1, pub.2, pub.3 and the broken DOI, with pub.2 only looked up once.
+        self.assertEqual(DimensionsStandIn.requests, 4)
+        self.assertEqual(
+            list(zip(expanded["src_title"], expanded["id"])),
+            [("First", "pub.1"), ("First", "pub.2"), ("Second", "pub.2"), ("Second", "pub.3")],
+        )
+
+    def test_doi_file_is_streamed_in_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target = f"{tmp}/dois.csv"
+            with open(target, "w") as f:
+                f.write("DOI,title\n")
+                for number in range(7):
+                    f.write(f"10.1000/{number},Paper {number}\n")
+                f.write(",Untitled\n10.1000/broken,Broken\n")
+            scraper = self.scraper_at(rate=1000, burst=10)
+            rows = stream_terms_from_doi(target, scraper, concurrency=2, chunk_size=3, queue_size=2)
+            self.assertEqual([row["doi"] for row in rows], [f"10.1000/{number}" for number in range(7)])
+
+    def test_resumed_doi_lookup_skips_journaled_dois(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target, journal_file = f"{tmp}/dois.csv", f"{tmp}/journal.jsonl"
+            with open(target, "w") as f:
+                f.write("DOI\n" + "".join(f"10.1000/{number}\n" for number in range(6)))
+            scraper = self.scraper_at(rate=1000, burst=10)
+            with Journal(journal_file) as journal:
+                rows = stream_terms_from_doi(target, scraper, chunk_size=2, queue_size=1, journal=journal)
+                # Stop after the first chunk, as a crash would.
+                self.assertEqual([next(rows)["doi"] for _ in range(2)], ["10.1000/0", "10.1000/1"])
+                rows.close()
+            DimensionsStandIn.requests = 0
+            with Journal(journal_file, resume=True) as journal:
+                rows = list(stream_terms_from_doi(target, scraper, chunk_size=2, journal=journal))
+            self.assertEqual(sorted(row["doi"] for row in rows), [f"10.1000/{number}" for number in range(6)])
+            self.assertLessEqual(DimensionsStandIn.requests, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+from unittest import mock
+
+from scrape.archive import PdfSource
+from scrape.config import ScrapeConfig
+from scrape.fetch import incremental_results
+from scrape.manifest import Manifest, scoring_fingerprint
+from scrape.scraper import ScrapeResult
+
+RESULT = ScrapeResult(
+    doi="10.1234/5678",
+    wordscore=2,
+    frequency=[("design", 4), ("trial", 1)],
+    study_design=[("survey", 1)],
+)
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest_file = os.path.join(self.tmp.name, "manifest.json")
+        self.paper = os.path.join(self.tmp.name, "paper.pdf")
+        with open(self.paper, "wb") as f:
+            f.write(b"%PDF-1.4 first version")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def source(self):
+        stat = os.stat(self.paper)
+        return PdfSource(self.paper, stat.st_size, stat.st_mtime)
+
+    def test_round_trip(self):
+        manifest = Manifest(self.manifest_file)
+        self.assertFalse(manifest.is_current(self.source()))
+        manifest.record(self.source(), RESULT)
+        manifest.save()
+        reloaded = Manifest(self.manifest_file)
+        self.assertTrue(reloaded.is_current(self.source()))
+        self.assertEqual(reloaded.result(self.paper), RESULT)
+
+    def test_touched_but_identical_file_is_current(self):
+        manifest = Manifest(self.manifest_file)
+        manifest.record(self.source(), RESULT)
+        os.utime(self.paper, (0, 0))
+        self.assertTrue(manifest.is_current(self.source()))
+
+    def test_modified_file_is_not_current(self):
+        manifest = Manifest(self.manifest_file)
+        manifest.record(self.source(), RESULT)
+        with open(self.paper, "wb") as f:
+            f.write(b"%PDF-1.4 other version")
+        os.utime(self.paper, (0, 0))
+        self.assertFalse(manifest.is_current(self.source()))
+
+    def test_changed_scoring_settings_discard_the_manifest(self):
+        manifest = Manifest(self.manifest_file, "old settings")
+        manifest.record(self.source(), RESULT)
+        manifest.save()
+        self.assertTrue(Manifest(self.manifest_file, "old settings").is_current(self.source()))
+        self.assertFalse(Manifest(self.manifest_file, "new settings").is_current(self.source()))
+
+    def test_fingerprint_follows_the_word_lists_and_settings(self):
+        words = os.path.join(self.tmp.name, "words.txt")
+        with open(words, "w") as f:
+            f.write("trial\n")
+        config = ScrapeConfig("", "", "", "", "", self.tmp.name, words, words, words)
+        fingerprint = scoring_fingerprint(config)
+        self.assertEqual(scoring_fingerprint(replace(config, workers=4)), fingerprint)
+        self.assertNotEqual(scoring_fingerprint(replace(config, tokenizer="nltk")), fingerprint)
+        self.assertNotEqual(scoring_fingerprint(replace(config, triage_pages=2)), fingerprint)
+        self.assertNotEqual(scoring_fingerprint(replace(config, max_document_bytes=1 << 20)), fingerprint)
+        with mock.patch("pdfplumber.__version__", "0.0.0"):
+            self.assertNotEqual(scoring_fingerprint(config), fingerprint)
+        with open(words, "a") as f:
+            f.write("survey\n")
+        self.assertNotEqual(scoring_fingerprint(config), fingerprint)
+
+    def test_results_scraped_before_an_interrupt_are_saved(self):
+        words = os.path.join(self.tmp.name, "words.txt")
+        with open(words, "w") as f:
+            f.write("trial\n")
+        with open(os.path.join(self.tmp.name, "second.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4 second")
+        config = ScrapeConfig(
+            "", "", "", "", "", self.tmp.name, words, words, words, manifest_file=self.manifest_file
+        )
+
+        def interrupted(sources, config, window):
+            yield RESULT
+            raise KeyboardInterrupt
+
+        with mock.patch("scrape.fetch.iter_scrape_pdf_files", interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                incremental_results(config)
+        manifest = Manifest(self.manifest_file, scoring_fingerprint(config))
+        self.assertEqual(manifest.result(self.paper), RESULT)
+        self.assertEqual(len(manifest.entries), 1)
+
+    def test_prune_drops_deleted_files(self):
+        manifest = Manifest(self.manifest_file)
+        manifest.record(self.source(), RESULT)
+        self.assertEqual(manifest.prune([]), 1)
+        self.assertIsNone(manifest.result(self.paper))
+
+    def test_the_scrape_is_run_to_its_end(self):
+        words = os.path.join(self.tmp.name, "words.txt")
+        with open(words, "w") as f:
+            f.write("trial\n")
+        config = ScrapeConfig(
+            "", "", "", "", "", self.tmp.name, words, words, words, manifest_file=self.manifest_file
+        )
+        finished = []
+
+        def scrape(sources, config, window):
+            yield from (RESULT for _ in sources)
+            # Where the triage summary is logged.
+            finished.append(True)
+
+        with mock.patch("scrape.fetch.iter_scrape_pdf_files", scrape):
+            incremental_results(config)
+        self.assertEqual(finished, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from collections import Counter
+
+from scrape.matrix import DocumentTermMatrixBuilder
+
+
+class TestDocumentTermMatrix(unittest.TestCase):
+    def setUp(self):
+        builder = DocumentTermMatrixBuilder()
+        builder.add(Counter({"trial": 2, "design": 2, "survey": 5, "data": 1}))
+        builder.add(Counter())
+        builder.add(Counter({"data": 3, "cohort": 1}))
+        self.matrix = builder.build()
+
+    def test_shares_vocabulary(self):
+        self.assertEqual(self.matrix.counts.shape, (3, 5))
+        self.assertEqual(self.matrix.counts.nnz, 6)
+
+    def test_top_terms(self):
+        self.assertEqual(
+            self.matrix.top_terms(2),
+            [[("survey", 5), ("trial", 2)], [], [("data", 3), ("cohort", 1)]],
+        )
+
+    def test_top_terms_in_columns(self):
+        columns = self.matrix.columns({"data", "trial", "unseen"})
+        self.assertEqual(
+            self.matrix.top_terms(3, columns),
+            [[("trial", 2), ("data", 1)], [], [("data", 3)]],
+        )
+
+    def test_count_present(self):
+        columns = self.matrix.columns({"data", "trial"})
+        self.assertEqual(self.matrix.count_present(columns).tolist(), [2, 0, 1])
+        self.assertEqual(
+            self.matrix.count_present(self.matrix.columns(set())).tolist(), [0, 0, 0]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
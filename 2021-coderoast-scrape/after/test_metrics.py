@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+from scrape.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_stage_accumulates(self):
+        for _ in range(3):
+            with self.metrics.stage("extract"):
+                sum(range(1000))
+        stats = self.metrics.stages["extract"]
+        self.assertEqual(stats.calls, 3)
+        self.assertGreater(stats.wall, 0)
+
+    def test_stage_times_a_failed_block_into_its_histogram(self):
+        with self.assertRaises(TimeoutError):
+            with self.metrics.stage("http", histogram="http_request_seconds"):
+                raise TimeoutError
+        self.assertEqual(self.metrics.stages["http"].calls, 1)
+        self.assertEqual(sum(self.metrics.histograms["http_request_seconds"].counts), 1)
+
+    def test_timed_closes_wrapped_generator(self):
+        closed = []
+
+        def pages():
+            try:
+                yield from ["a", "b", "c"]
+            finally:
+                closed.append(True)
+
+        timed = self.metrics.timed("extract", pages())
+        self.assertEqual(next(timed), "a")
+        timed.close()
+        self.assertEqual(closed, [True])
+
+    def test_merge(self):
+        worker = Metrics()
+        with worker.stage("tokenize"):
+            pass
+        worker.count("pages", 4)
+        worker.observe("http_request_seconds", 0.2)
+        self.metrics.count("pages", 1)
+        self.metrics.merge(worker.snapshot())
+        self.metrics.merge(worker.snapshot())
+        self.assertEqual(self.metrics.counters["pages"], 9)
+        self.assertEqual(self.metrics.stages["tokenize"].calls, 2)
+        self.assertEqual(sum(self.metrics.histograms["http_request_seconds"].counts), 2)
+
+    def test_prometheus_buckets_are_cumulative(self):
+        for seconds in (0.01, 0.3, 100):
+            self.metrics.observe("http_request_seconds", seconds)
+        with tempfile.TemporaryDirectory() as folder:
+            textfile = os.path.join(folder, "sciscraper.prom")
+            self.metrics.write_prometheus(textfile)
+            with open(textfile) as f:
+                lines = f.read().splitlines()
+        self.assertIn('sciscraper_http_request_seconds_bucket{le="0.05"} 1', lines)
+        self.assertIn('sciscraper_http_request_seconds_bucket{le="0.5"} 2', lines)
+        self.assertIn('sciscraper_http_request_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("sciscraper_http_request_seconds_count 3", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+
+from scrape.metrics import METRICS
+from scrape.papers import DownloadIndex, normalize_doi
+from scrape.scihub import SciHubScrape
+
+
+def write(path_name, content):
+    with open(path_name, "wb") as file:
+        file.write(content)
+
+
+class TestDownloadIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.research_dir = os.path.join(self.tmp.name, "research")
+        os.mkdir(self.research_dir)
+        self.index = DownloadIndex(os.path.join(self.tmp.name, "index.sqlite"))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def paper(self, name, content):
+        path_name = os.path.join(self.research_dir, name)
+        write(path_name, content)
+        return path_name
+
+    def test_dois_are_normalized_without_losing_their_slash(self):
+        self.assertEqual(normalize_doi(" 10.1000/ABC.def "), "10.1000/abc.def")
+        self.assertNotEqual(normalize_doi("10.1000/1234"), normalize_doi("10.10001/234"))
+
+    def test_dois_that_read_the_same_without_slashes_are_kept_apart(self):
+        path_name = self.paper("210101_10.10001234.pdf", b"%PDF 1234")
+        self.index.add("10.1000/1234", path_name)
+        self.assertEqual(self.index.lookup("10.1000/1234"), path_name)
+        self.assertIsNone(self.index.lookup("10.10001/234"))
+
+    def test_known_papers_are_found_by_doi(self):
+        path_name = self.paper("210101_10.1000abc.pdf", b"%PDF abc")
+        self.index.add("10.1000/ABC", path_name)
+        self.assertEqual(self.index.lookup("10.1000/abc"), path_name)
+        self.assertIsNone(self.index.lookup("10.1000/other"))
+        os.remove(path_name)
+        self.assertIsNone(self.index.lookup("10.1000/abc"))
+
+    def test_identical_downloads_are_collapsed(self):
+        first = self.paper("210101_10.1000abc.pdf", b"%PDF same")
+        second = self.paper("210102_10.1000xyz.pdf", b"%PDF same")
+        self.assertEqual(self.index.add("10.1000/abc", first), first)
+        self.assertEqual(self.index.add("10.1000/xyz", second), first)
+        self.assertFalse(os.path.exists(second))
+        self.assertEqual(self.index.lookup("10.1000/xyz"), first)
+
+    def test_scan_collapses_papers_under_any_date(self):
+        older = self.paper("210101_10.1000abc.pdf", b"%PDF abc")
+        self.paper("210305_10.1000abc.pdf", b"%PDF abc")
+        self.paper("notes.txt", b"not a paper")
+        self.index.scan(self.research_dir)
+        self.assertEqual(sorted(os.listdir(self.research_dir)), ["210101_10.1000abc.pdf", "notes.txt"])
+        # A later download of the same paper is collapsed into the scanned copy.
+        self.assertEqual(self.index.add("10.1000/ABC", self.paper("210401_10.1000abc.pdf", b"%PDF abc")), older)
+        self.assertEqual(self.index.lookup("10.1000/abc"), older)
+
+    def test_pending_downloads_are_settled_by_their_future(self):
+        scraper = SciHubScrape("http://127.0.0.1:9/", self.research_dir, index=self.index)
+        path_name = self.paper("210101_10.1000abc.pdf", b"%PDF abc")
+        outcomes = {"10.1000/abc": path_name, "10.1000/none": None, "10.1000/raised": OSError("disk full")}
+        for doi, outcome in outcomes.items():
+            self.index.mark_pending(doi)
+            self.assertTrue(self.index.is_pending(doi.upper()))
+            done = Future()
+            if isinstance(outcome, Exception):
+                done.set_exception(outcome)
+            else:
+                done.set_result(outcome)
+            scraper.index_download(doi, done)
+        scraper.downloader.close()
+        self.assertEqual([self.index.is_pending(doi) for doi in outcomes], [False, False, False])
+        self.assertEqual(self.index.lookup("10.1000/abc"), path_name)
+        self.assertIsNone(self.index.lookup("10.1000/raised"))
+
+    def test_scihub_skips_known_papers_before_searching(self):
+        self.index.add("10.1000/abc", self.paper("210101_10.1000abc.pdf", b"%PDF abc"))
+        # Nothing listens at this address, so any request would fail.
+        scraper = SciHubScrape("http://127.0.0.1:9/", self.research_dir, index=self.index)
+        METRICS.reset()
+        scraper.scrape("10.1000/abc")
+        scraper.downloader.close()
+        self.assertEqual(METRICS.counters, {"downloads_skipped": 1})
+        self.assertEqual(os.listdir(self.research_dir), ["210101_10.1000abc.pdf"])
+
+    def test_scihub_skips_papers_already_queued(self):
+        self.index.mark_pending("10.1000/abc")
+        scraper = SciHubScrape("http://127.0.0.1:9/", self.research_dir, index=self.index)
+        METRICS.reset()
+        scraper.scrape("10.1000/ABC")
+        scraper.downloader.close()
+        self.assertEqual(METRICS.counters, {"downloads_skipped": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
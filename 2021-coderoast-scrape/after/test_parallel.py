@@ -0,0 +1,60 @@
+import os
+import unittest
+from collections import Counter
+from unittest import mock
+
+from scrape.archive import PdfSource
+from scrape.config import ScrapeConfig
+from scrape.parallel import count_pdf_files
+from scrape.pdf import DocumentCounts
+
+
+class StandInScraper:
+    """Counts the words of a document's name, and takes its worker down with it if the document is named "crash"."""
+
+    def count_words(self, name, data):
+        if name == "crash":
+            os._exit(1)
+        words = Counter(f"{name} words {name}".split())
+        return DocumentCounts(name, words, Counter())
+
+
+class TestCountPdfFiles(unittest.TestCase):
+    def setUp(self):
+        self.config = ScrapeConfig(
+            export_dir="",
+            prime_src="",
+            url_dmnsns="",
+            research_dir="",
+            url_scihub="",
+            paper_folder="",
+            research_words="",
+            bycatch_words="",
+            target_words="",
+        )
+        patcher = mock.patch("scrape.parallel.build_pdf_scraper", lambda config: StandInScraper())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def count(self, names, workers):
+        sources = [PdfSource(name, 0, 0.0) for name in names]
+        config = ScrapeConfig(**{**vars(self.config), "workers": workers})
+        return list(count_pdf_files(sources, config, StandInScraper()))
+
+    def test_parallel_matches_sequential(self):
+        names = [f"paper{number}" for number in range(12)]
+        self.assertEqual(self.count(names, workers=3), self.count(names, workers=1))
+
+    def test_a_crashing_document_is_isolated(self):
+        names = [f"paper{number}" for number in range(8)] + ["crash"] + [f"later{number}" for number in range(8)]
+        results = self.count(names, workers=2)
+        self.assertEqual([index for index, _ in results], list(range(len(names))))
+        self.assertIsNone(results[8][1])
+        # Only the files in flight alongside the crash are lost, and the rest go to a fresh pool.
+        lost = [names[index] for index, counts in results if counts is None]
+        self.assertLessEqual(len(lost), 2 * 2)
+        self.assertEqual(results[-1][1].words, Counter({"later7": 2, "words": 1}))
+
+
+if __name__ == "__main__":
+    unittest.main()
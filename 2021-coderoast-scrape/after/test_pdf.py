@@ -1,18 +1,142 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 
-from scrape.pdf import compute_filtered_tokens
+from scrape import pdf
+from scrape.pdf import PDFScrape, compute_filtered_tokens
+from scrape.tokens import TOKENIZERS, fast_tokenize
+
+PAPER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "papers",
+    "Anyone Can Become a Troll_ Causes of Trolling Behavior in Online Discussions.pdf",
+)
+
+
+def word_file(test, *terms):
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as words:
+        words.write("".join(f"{term}\n" for term in terms))
+    test.addCleanup(os.remove, words.name)
+    return words.name
 
 
 class TestPdfScraper(unittest.TestCase):
     def test_filtered_tokens_empty(self):
-        self.assertEqual(len(compute_filtered_tokens([])), 0)
+        for engine in TOKENIZERS:
+            with self.subTest(engine=engine):
+                self.assertEqual(len(compute_filtered_tokens([], engine)), 0)
 
     def test_filtered_tokens_stop(self):
-        tokens = ["please like and subscribe"]
-        filtered_tokens = compute_filtered_tokens(tokens)
-        print(tokens)
-        print(filtered_tokens)
-        self.assertEqual(filtered_tokens, {"please", "like", "subscribe"})
+        for engine in TOKENIZERS:
+            with self.subTest(engine=engine):
+                tokens = ["please like and subscribe"]
+                filtered_tokens = compute_filtered_tokens(tokens, engine)
+                print(tokens)
+                print(filtered_tokens)
+                self.assertEqual(filtered_tokens, {"please", "like", "subscribe"})
+
+    def test_fast_engine_matches_nltk(self):
+        texts = [
+            [],
+            ["please like and subscribe"],
+            ["we cannot say we wanna", "gonna gotta lemme gimme 3 x_y café"],
+        ]
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    compute_filtered_tokens(text, "fast"),
+                    compute_filtered_tokens(text, "nltk"),
+                )
+
+    def test_fast_tokenize_splits_contractions(self):
+        self.assertEqual(
+            fast_tokenize("i cannot\nwanna go"), ["i", "can", "not", "wan", "na", "go"]
+        )
+
+
+class TestPageChunks(unittest.TestCase):
+    def scraper(self, page_workers, triage_pages=0):
+        words = word_file(self, "troll")
+        scraper = PDFScrape(
+            words,
+            words,
+            words,
+            page_workers=page_workers,
+            page_parallel_threshold=1,
+            triage_pages=triage_pages,
+        )
+        self.addCleanup(scraper.close)
+        return scraper
+
+    def test_chunked_extraction_matches_sequential(self):
+        sequential = list(self.scraper(1).extract_pages_from_pdf(PAPER))
+        chunked = self.scraper(3)
+        self.assertEqual(list(chunked.extract_pages_from_pdf(PAPER)), sequential)
+        pool = chunked.page_pool
+        # A second document reuses the same processes.
+        self.assertEqual(list(chunked.extract_pages_from_pdf(PAPER)), sequential)
+        self.assertIs(chunked.page_pool, pool)
+
+    def test_each_page_is_released_once_extracted(self):
+        with mock.patch("pdfplumber.page.Page.close", autospec=True) as close:
+            for page_number, _ in enumerate(self.scraper(1).extract_pages_from_pdf(PAPER)):
+                self.assertEqual(close.call_count, page_number + 1)
+
+    def test_triage_reads_its_pages_before_starting_chunks(self):
+        sequential = list(self.scraper(1).extract_pages_from_pdf(PAPER))
+        scraper = self.scraper(3, triage_pages=2)
+        pages = scraper.extract_pages_from_pdf(PAPER)
+        self.assertEqual([next(pages) for _ in range(2)], sequential[:2])
+        pages.close()
+        # A paper decided by triage leaves no chunks of the rest running.
+        self.assertIsNone(scraper.page_pool)
+        self.assertEqual(list(scraper.extract_pages_from_pdf(PAPER)), sequential)
+
+
+class TestTriage(unittest.TestCase):
+    """The paper's first page mentions trolling, antisocial behavior and, once, database management,
+    which its embedded keywords mention again."""
+
+    def scraper(self, target, bycatch=(), **triage):
+        return PDFScrape(
+            word_file(self, "survey"),
+            word_file(self, *bycatch),
+            word_file(self, *target),
+            tokenizer="fast",
+            **triage,
+        )
+
+    def test_accepted_from_the_front_matter(self):
+        scraper = self.scraper(["trolling", "antisocial behavior"], triage_pages=1, triage_accept=2)
+        with mock.patch("scrape.pdf.open_pdf", wraps=pdf.open_pdf) as open_pdf:
+            counts = scraper.count_words(PAPER)
+        self.assertEqual(open_pdf.call_count, 1)
+        self.assertTrue(counts.decided_early)
+        self.assertEqual(counts.pages_skipped, 29)
+
+    def test_rejected_from_the_front_matter(self):
+        scraper = self.scraper(["survey"], bycatch=["trolling"], triage_pages=1, triage_reject=-1)
+        counts = scraper.count_words(PAPER)
+        self.assertTrue(counts.decided_early)
+        self.assertEqual(counts.pages_skipped, 29)
+
+    def test_undecided_papers_are_counted_as_without_triage(self):
+        target = ["trolling", "antisocial behavior", "database management"]
+        triaged = self.scraper(target, triage_pages=1, triage_accept=10).count_words(PAPER)
+        untriaged = self.scraper(target).count_words(PAPER)
+        self.assertFalse(triaged.decided_early)
+        self.assertEqual(triaged.pages_skipped, 0)
+        self.assertEqual(triaged.terms, untriaged.terms)
+        self.assertEqual(triaged.words, untriaged.words)
+        self.assertEqual(triaged.terms["database management"], 1)
+
+    def test_front_matter_counts_towards_an_early_decision(self):
+        target = ["trolling", "database management", "data mining"]
+        counts = self.scraper(target, triage_pages=1, triage_accept=3).count_words(PAPER)
+        self.assertTrue(counts.decided_early)
+        self.assertEqual(counts.terms["database management"], 2)
 
 
 if __name__ == "__main__":
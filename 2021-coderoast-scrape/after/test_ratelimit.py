@@ -0,0 +1,74 @@
+import time
+import unittest
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from scrape.ratelimit import AdaptiveRateLimiter, RateLimiter, retry_after_seconds
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_reservations_queue_up(self):
+        limiter = RateLimiter(rate=10, burst=2)
+        delays = [limiter.reserve() for _ in range(4)]
+        self.assertEqual(delays[:2], [0.0, 0.0])
+        self.assertAlmostEqual(delays[2], 0.1, places=2)
+        self.assertAlmostEqual(delays[3], 0.2, places=2)
+
+    def test_pause_holds_back_waiters(self):
+        limiter = RateLimiter(rate=1000, burst=5)
+        limiter.pause(0.2)
+        start = time.monotonic()
+        limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.limiter = AdaptiveRateLimiter(
+            rate=2.0, min_rate=0.5, max_rate=2.2, increase=0.1, decrease=0.5
+        )
+
+    def test_additive_increase(self):
+        self.limiter.on_success()
+        self.assertAlmostEqual(self.limiter.rate, 2.1)
+        self.limiter.on_success()
+        self.limiter.on_success()
+        self.assertAlmostEqual(self.limiter.rate, 2.2)
+
+    def test_multiplicative_decrease(self):
+        self.assertEqual(self.limiter.on_throttle(retry_after=None), 1.0)
+        self.assertEqual(self.limiter.rate, 1.0)
+        self.assertGreater(self.limiter.remaining_pause(), 0.9)
+        self.limiter.decreased_at -= 1.0
+        self.limiter.on_throttle(retry_after=0)
+        self.limiter.decreased_at -= 2.0
+        self.limiter.on_throttle(retry_after=0)
+        self.assertEqual(self.limiter.rate, 0.5)
+        self.assertEqual(self.limiter.throttles, 3)
+
+    def test_one_decrease_per_interval(self):
+        for _ in range(5):
+            self.limiter.on_throttle(retry_after=0)
+        # The requests in flight when the first throttle came back do not cut the rate again.
+        self.assertEqual(self.limiter.rate, 1.0)
+        self.assertEqual(self.limiter.throttles, 5)
+        self.limiter.decreased_at -= 1.0
+        self.limiter.on_throttle(retry_after=0)
+        self.assertEqual(self.limiter.rate, 0.5)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(retry_after_seconds("120"), 120.0)
+
+    def test_http_date(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        self.assertAlmostEqual(retry_after_seconds(format_datetime(retry_at, usegmt=True)), 30, delta=2)
+
+    def test_missing_or_malformed(self):
+        self.assertIsNone(retry_after_seconds(None))
+        self.assertIsNone(retry_after_seconds("soon"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import pandas as pd
+
+from scrape.export import CSVBatchWriter, export_stream
+from scrape.scraper import ScrapeResult
+from scrape.stream import chunked, prefetch, read_column
+
+
+class TestStream(unittest.TestCase):
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(chunked([], 3)), [])
+
+    def test_read_column_skips_missing_values(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target = os.path.join(tmp, "papers.csv")
+            pd.DataFrame({"DOI": ["10.1/a", None, "10.1/b", "10.1/c"], "n": range(4)}).to_csv(target)
+            self.assertEqual(list(read_column(target, "DOI", chunk_size=2)), ["10.1/a", "10.1/b", "10.1/c"])
+
+    def test_prefetch_keeps_order_within_its_bound(self):
+        produced = []
+
+        def numbers():
+            for number in range(50):
+                produced.append(number)
+                yield number
+
+        results = prefetch(numbers(), maxsize=4)
+        self.assertEqual(next(results), 0)
+        # One item is taken, four wait in the queue and one is held by the blocked producer.
+        threading.Event().wait(0.3)
+        self.assertLessEqual(len(produced), 6)
+        self.assertEqual(list(results), list(range(1, 50)))
+
+    def test_prefetch_raises_producer_errors(self):
+        def failing():
+            yield 1
+            raise ValueError("broken")
+
+        results = prefetch(failing(), maxsize=2)
+        self.assertEqual(next(results), 1)
+        with self.assertRaises(ValueError):
+            next(results)
+
+    def test_prefetch_stops_the_producer_when_closed(self):
+        results = prefetch(iter(range(1000)), maxsize=2)
+        next(results)
+        results.close()
+
+
+class TestCSVBatchWriter(unittest.TestCase):
+    def test_matches_a_single_export(self):
+        rows = [ScrapeResult(f"10.1/{number}", number, [("cell", number)], []) for number in range(5)]
+        with tempfile.TemporaryDirectory() as tmp:
+            whole, batched = os.path.join(tmp, "whole.csv"), os.path.join(tmp, "batched.csv")
+            pd.DataFrame(rows).to_csv(whole)
+            with CSVBatchWriter(batched, batch_size=2) as writer:
+                for row in rows[:3]:
+                    writer.write(row)
+                # The first full batch is on disk before the run is over.
+                self.assertEqual(len(pd.read_csv(batched)), 2)
+                for row in rows[3:]:
+                    writer.write(row)
+            with open(whole) as expected, open(batched) as actual:
+                self.assertEqual(actual.read(), expected.read())
+
+
+class TestExportStream(unittest.TestCase):
+    def test_creates_the_export_folder(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            export_dir = os.path.join(tmp, "exports")
+            path_name = export_stream(iter([{"a": 1}]), export_dir)
+            self.assertEqual(os.path.dirname(path_name), export_dir)
+            self.assertEqual(pd.read_csv(path_name, index_col=0)["a"].tolist(), [1])
+
+    def test_no_rows_no_spreadsheet(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertIsNone(export_stream(iter([]), tmp))
+            self.assertEqual(os.listdir(tmp), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
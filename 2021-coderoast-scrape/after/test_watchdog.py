@@ -0,0 +1,121 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+from scrape.archive import PdfSource
+from scrape.config import ScrapeConfig
+from scrape.watchdog import Supervisor, _rss_bytes, _serve
+
+HOG_BYTES = 300 << 20
+
+
+def misbehave(name, data):
+    """Counts a stand-in document, which misbehaves the way its name says."""
+    if name == "hang":
+        time.sleep(60)
+    if name.endswith(".pid"):
+        # Stands in for a page pool the worker started, which has to die with it, and records its pid in name.
+        child = multiprocessing.Process(target=time.sleep, args=(60,))
+        child.start()
+        with open(name, "w") as f:
+            f.write(str(child.pid))
+        time.sleep(60)
+    if name == "hog":
+        hog = b"\x01" * HOG_BYTES
+        time.sleep(60)
+        return len(hog)
+    if name == "crash":
+        os._exit(3)
+    if name == "error":
+        raise ValueError("a transient error")
+    return f"counts of {name}"
+
+
+def stand_in_worker(config, conn):
+    _serve(conn, misbehave)
+
+
+def is_running(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+class TestSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = ScrapeConfig(
+            export_dir="",
+            prime_src="",
+            url_dmnsns="",
+            research_dir="",
+            url_scihub="",
+            paper_folder="",
+            research_words="",
+            bycatch_words="",
+            target_words="",
+            workers=2,
+            doc_timeout=1.5,
+            doc_max_memory=(_rss_bytes(os.getpid()) or 0) + HOG_BYTES // 2,
+            quarantine_file=os.path.join(self.tmp.name, "quarantine.jsonl"),
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_supervisor(self, names, size=0):
+        sources = [PdfSource(name, size, 0.0) for name in names]
+        supervisor = Supervisor(self.config, worker_target=stand_in_worker)
+        return [counts for _, counts in supervisor.run(sources)]
+
+    def quarantined(self):
+        if not os.path.exists(self.config.quarantine_file):
+            return {}
+        with open(self.config.quarantine_file) as f:
+            return {entry["file"]: entry["reason"] for entry in map(json.loads, f)}
+
+    def test_misbehaving_documents_are_quarantined(self):
+        results = self.run_supervisor(["ok", "hang", "crash", "hog", "error", "last"])
+        self.assertEqual(results, ["counts of ok", None, None, None, None, "counts of last"])
+        reasons = self.quarantined()
+        self.assertEqual(sorted(reasons), ["crash", "hang", "hog"])
+        self.assertIn("timed out", reasons["hang"])
+        self.assertIn("exit code 3", reasons["crash"])
+        self.assertIn("memory", reasons["hog"])
+
+    def test_an_ordinary_error_is_retried_on_the_next_run(self):
+        self.assertEqual(self.run_supervisor(["error"]), [None])
+        self.assertEqual(self.quarantined(), {})
+        self.assertEqual(self.run_supervisor(["crash", "ok"]), [None, "counts of ok"])
+        # The quarantined document is skipped without being sent to a worker.
+        self.assertEqual(self.run_supervisor(["crash", "ok"]), [None, "counts of ok"])
+        self.assertEqual(list(self.quarantined()), ["crash"])
+
+    def test_a_changed_document_is_tried_again(self):
+        self.run_supervisor(["crash"])
+        self.run_supervisor(["crash"])
+        with open(self.config.quarantine_file) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        # A copy of a different size is sent to a worker, where it crashes again.
+        self.run_supervisor(["crash"], size=1)
+        with open(self.config.quarantine_file) as f:
+            self.assertEqual([json.loads(line)["size"] for line in f], [0, 1])
+
+    def test_killing_a_worker_kills_the_processes_it_started(self):
+        pid_file = os.path.join(self.tmp.name, "child.pid")
+        self.run_supervisor([pid_file])
+        with open(pid_file) as f:
+            child = int(f.read())
+        deadline = time.monotonic() + 5
+        while is_running(child) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(is_running(child))
+
+
+if __name__ == "__main__":
+    unittest.main()